@@ -17,7 +17,11 @@
 # It also uses a background thread for exit command detection, which works reliably
 # on Windows.
 # ==============================================================================
+import argparse
 import asyncio
+import atexit
+import functools
+import bisect
 import random
 import re
 import sys
@@ -26,17 +30,25 @@ import json
 import signal
 import logging
 import os
+import sqlite3
+import subprocess
 import threading
+import contextlib
+import hashlib
+import io
+import shutil
+import tempfile
+from collections import OrderedDict, defaultdict, deque
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
 
 from telethon import TelegramClient, events
-from telethon.errors import FloodWaitError, RPCError, ChatForwardsRestrictedError
+from telethon.errors import (FloodWaitError, RPCError, ChatForwardsRestrictedError,
+                             AccessTokenInvalidError, ApiIdInvalidError)
 from colorama import init
-from tqdm import tqdm
-from tqdm.asyncio import tqdm as atqdm
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+# tqdm and cryptography are imported where they are used, so the daemon and
+# unlocks with a remembered key start without loading them.
 import base64
 import getpass
 
@@ -47,9 +59,68 @@ init(autoreset=True)
 # ------------------------------------------------------------------------------
 CONFIG_FILE = 'telegramconfiguration.json'
 CREDENTIALS_FILE = 'credentials.json'
+KEY_FILE = 'soluify.key'   # Remembered credentials key (see remember_key)
+KDF_ITERATIONS = 100000
+LEGACY_SALT = b'soluify_salt'  # Salt of credentials files written before per-file salts
+STATE_FILE = os.path.join(os.path.dirname(CONFIG_FILE), 'soluify_state.db')
 LOG_FILE = 'soluify.log'
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Size at which the log file is rotated
+LOG_BACKUP_COUNT = 3             # Rotated log files kept (soluify.log.1, ...)
+OUTPUT_MODE = 'color'            # Console: 'color', 'plain', 'quiet' (errors only) or 'json'
+CONSOLE_RATE_INTERVAL = 1.0      # Seconds between repeated status lines of the same kind
+GRADIENT_CACHE_SIZE = 256        # Rendered gradient strings kept for reuse
 MAX_RETRIES = 3
 RETRY_DELAY = 5
+HEALTH_CHECK_INTERVAL = 30  # Seconds between keepalive requests per account
+HEALTH_CHECK_TIMEOUT = 10   # Seconds a keepalive or connect may take before the connection counts as dead
+RECONNECT_BASE_DELAY = 1    # First reconnect delay; doubles with every failed attempt (plus jitter)
+RECONNECT_MAX_DELAY = 120   # Longest wait between reconnect attempts
+POLL_INTERVAL = 5          # Seconds between polling cycles in 'poll' mode
+GAP_FILL_INTERVAL = 60     # Seconds between safety polls in 'push' mode
+INGEST_MODE = 'push'       # 'push' (real-time events) or 'poll' (legacy loop)
+MAX_CONCURRENT_SENDS = 10  # Sends in flight at the same time (all destinations)
+GLOBAL_SEND_RATE = 30      # Messages/second for the whole bot (Telegram bot limit)
+CHAT_SEND_RATE = 20 / 60   # Messages/second per destination chat (Telegram allows bots ~20/minute in a group)
+CHAT_SEND_BURST = 3        # Messages a quiet chat may receive back to back
+SEND_QUEUE_SIZE = 200      # Queued sends per destination before producers wait
+FILTER_WORKERS = 2         # Filter/clean workers (each owns a share of the source chats)
+MEDIA_WORKERS = 4          # Media fetch/upload workers (each owns a share of the source chats)
+STAGE_QUEUE_SIZE = 100     # Items waiting per worker before the previous stage waits
+MEDIA_BUFFER = 'spool'     # 'memory', 'spool' (RAM, then temp file) or 'disk' (temp dir)
+MEDIA_SPOOL_MAX_SIZE = 20 * 1024 * 1024  # Bytes kept in RAM before a spool hits the disk
+CHECKPOINT_FLUSH_EVERY = 20      # Pending checkpoint updates before a write
+CHECKPOINT_FLUSH_INTERVAL = 5    # Max seconds a checkpoint update stays in memory
+MAX_CATCHUP_MESSAGES = 500       # Per source, on restart (older backlog is skipped)
+CLEAN_CACHE_SIZE = 1024          # Cleaned texts kept in memory
+METRICS_PORT = None              # e.g. 9464 to serve Prometheus metrics on 127.0.0.1
+METRICS_SUMMARY_INTERVAL = 60    # Seconds between metrics summary lines (0 = off)
+TRACE_FILE = 'soluify_traces.jsonl'
+TRACE_SAMPLE_RATE = 0.0          # Share of messages traced stage by stage (0 = off, 1 = all)
+TRACE_BUFFER_SIZE = 1000         # Traces kept in memory for the 'trace' summary
+RECENT_UPLOADS_SIZE = 64         # Uploaded media handles kept for reuse
+MEDIA_CACHE_DIR = 'soluify_media_cache'     # Downloaded media, one file per photo/document id
+MEDIA_CACHE_MAX_BYTES = 512 * 1024 * 1024   # Oldest files are evicted beyond this (0 = no cache)
+MAX_CONCURRENT_DOWNLOADS = 4     # Media files downloaded at the same time
+DOWNLOAD_PART_SIZE = 512 * 1024  # Bytes per request; a multiple of 4 KiB that divides 1 MiB
+DOWNLOAD_PARALLEL_PARTS = 4      # 1 MiB-aligned ranges of one large file fetched at once
+DEDUP_WINDOW = 3600              # Seconds a forwarded text/media is remembered (0 = off)
+DEDUP_CACHE_SIZE = 10000         # Remembered messages per process
+DEDUP_PRUNE_INTERVAL = 600       # Seconds between removals of expired entries from the state database
+DIALOG_UNCHANGED_STOP = 20       # Unchanged chats in a row that end an incremental chat list refresh
+DIALOG_FULL_REFRESH_INTERVAL = 24 * 3600  # Seconds before the chat list is fetched completely again
+CHATS_FILE = 'chats_of_reader.txt'
+READER_RING_REPLICAS = 64        # Points per account on the reader pool hash ring
+PROFILE_RELOAD_INTERVAL = 2      # Seconds between checks of the profiles file while forwarding
+ENV_PREFIX = 'SOLUIFY_'          # Daemon credentials: SOLUIFY_API_ID, SOLUIFY_BOT_TOKEN, ...
+SQLITE_BUSY_TIMEOUT = 30         # Seconds a process waits for another one writing the state database
+WORKER_HEARTBEAT_INTERVAL = 5    # Seconds between heartbeats of a sharded worker process
+WORKER_HEARTBEAT_TIMEOUT = 60    # A worker without a heartbeat for this long is restarted
+WORKER_RESTART_DELAY = 5         # First restart delay of a crashed worker; doubles while it keeps crashing
+WORKER_RESTART_MAX_DELAY = 300
+WORKER_STOP_TIMEOUT = 30         # Seconds workers get to drain on shutdown before they are killed
+EXIT_CONFIG_ERROR = 78           # Daemon exit code for bad credentials/profiles; the supervisor does not restart it
+FAKE_STATE_FILE = os.path.join(os.path.dirname(CONFIG_FILE), 'soluify_fake_state.db')
+FAKE_LATENCY = 0.005             # Seconds per request of the fake backend
 
 # ------------------------------------------------------------------------------
 # Colors and gradient settings
@@ -64,11 +135,20 @@ PROMPT_COLOR_END = (135, 206, 250)  # Light Sky Blue
 # ------------------------------------------------------------------------------
 # Logging
 # ------------------------------------------------------------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'level': record.levelname.lower(), 'message': record.getMessage()}
+        if record.exc_info:
+            entry['error'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
 def setup_logger():
     logger = logging.getLogger('soluify')
     logger.setLevel(logging.DEBUG)
 
-    file_handler = logging.FileHandler(LOG_FILE)
+    # The file is only created once something is logged to it.
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                       encoding='utf-8', delay=True)
     file_handler.setLevel(logging.ERROR)
 
     console_handler = logging.StreamHandler()
@@ -78,17 +158,246 @@ def setup_logger():
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Records are only queued by the caller; a background thread does the I/O.
+    log_queue = SimpleQueue()
+    logger.listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    logger.listener.start()
+    atexit.register(logger.listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
 
     return logger
 
 logger = setup_logger()
 
+# ------------------------------------------------------------------------------
+# Metrics: counters, histograms and gauges in the Prometheus text format
+# ------------------------------------------------------------------------------
+class Metrics:
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.gauges = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        self.counters[self.key(name, labels)] += value
+
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = [[0] * len(self.BUCKETS), 0.0, 0]
+        buckets, _, _ = histogram = self.histograms[key]
+        for i, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    def gauge(self, name, func):
+        """
+        Registers a callable that is evaluated every time the metrics are read.
+        """
+        self.gauges[name] = func
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def total(self, name):
+        return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def mean(self, name):
+        histograms = [h for (key, _), h in self.histograms.items() if key == name]
+        count = sum(h[2] for h in histograms)
+        return (sum(h[1] for h in histograms) / count if count else 0.0), count
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    def render(self):
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self.format_labels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in sorted(self.histograms.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, bucket_count in zip(self.BUCKETS, buckets):
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{self.format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+        for name, func in sorted(self.gauges.items()):
+            try:
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {func()}")
+            except Exception as e:
+                logger.error(f"Metrics gauge {name} failed: {e}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        send_mean, sends = self.mean('soluify_send_seconds')
+        filter_mean, _ = self.mean('soluify_filter_seconds')
+        queue = self.gauges.get('soluify_send_queue_depth', lambda: 0)()
+        return (f"forwarded={int(self.total('soluify_messages_forwarded_total'))} "
+                f"filtered={int(self.total('soluify_messages_filtered_total'))} "
+                f"sends={sends} send_avg={send_mean * 1000:.0f}ms filter_avg={filter_mean * 1e6:.0f}us "
+                f"down={self.total('soluify_download_bytes_total') / 1048576:.1f}MiB "
+                f"up={self.total('soluify_upload_bytes_total') / 1048576:.1f}MiB "
+                f"floodwait={self.total('soluify_flood_wait_seconds_total'):.0f}s queue={queue}")
+
+    async def handle_request(self, reader, writer):
+        try:
+            await reader.readline()
+            body = self.render().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                         b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, port, host='127.0.0.1'):
+        """
+        Serves the metrics over HTTP (any path) until the returned server is closed.
+        """
+        server = await asyncio.start_server(self.handle_request, host, port)
+        logger.info(f"Metrics available on http://{host}:{port}/metrics")
+        return server
+
+    async def report_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(f"Metrics: {self.summary()}")
+
+metrics = Metrics()
+
+# ------------------------------------------------------------------------------
+# Tracing: per-message stage timestamps (sampled) for latency breakdowns
+# ------------------------------------------------------------------------------
+class Tracer:
+    def __init__(self, path=TRACE_FILE, sample_rate=TRACE_SAMPLE_RATE, buffer_size=TRACE_BUFFER_SIZE):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        # Traces in progress by (source chat, message id), and the finished ones.
+        self.active = OrderedDict()
+        self.finished = deque(maxlen=buffer_size)
+        self.file = None
+
+    def start(self, chat_id, message_id, posted=None):
+        """
+        Starts tracing a message if it is sampled. `posted` is its post time.
+        """
+        key = (chat_id, message_id)
+        if not self.sample_rate or key in self.active or random.random() >= self.sample_rate:
+            return
+        self.active[key] = {'source': chat_id, 'message': message_id,
+                            'posted': posted.timestamp() if posted else None, 'stages': [], 'pending': 0}
+        if len(self.active) > self.buffer_size:
+            self.active.popitem(last=False)
+        self.mark(chat_id, message_id, 'detected')
+
+    def mark(self, chat_id, message_id, stage, **fields):
+        trace = self.active.get((chat_id, message_id))
+        if trace is not None:
+            trace['stages'].append(dict(stage=stage, at=time.time(), **fields))
+
+    def hold(self, chat_id, message_id):
+        # One hold per profile delivery; the trace ends when all are released.
+        trace = self.active.get((chat_id, message_id))
+        if trace is not None:
+            trace['pending'] += 1
+
+    def release(self, chat_id, message_id):
+        trace = self.active.get((chat_id, message_id))
+        if trace is not None:
+            trace['pending'] -= 1
+            if trace['pending'] <= 0:
+                self.finish(chat_id, message_id)
+
+    def finish(self, chat_id, message_id):
+        trace = self.active.pop((chat_id, message_id), None)
+        if trace is None:
+            return
+        del trace['pending']
+        previous = trace['posted'] or trace['stages'][0]['at']
+        for stage in trace['stages']:
+            stage['elapsed'] = round(stage['at'] - previous, 6)
+            previous = stage['at']
+        trace['total'] = round(previous - (trace['posted'] or trace['stages'][0]['at']), 6)
+        self.finished.append(trace)
+        try:
+            if self.file is None:
+                self.file = open(self.path, 'a', buffering=1)
+            self.file.write(json.dumps(trace) + '\n')
+        except OSError as e:
+            logger.error(f"Error writing trace: {e}")
+
+    def load(self, path=None):
+        """
+        Reads traces from a JSONL file into the ring buffer (for --trace-summary).
+        """
+        with open(path or self.path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    self.finished.append(json.loads(line))
+
+    def summary(self, top=5):
+        """
+        Returns lines with the time spent reaching each stage (slowest first, by
+        95th percentile) and the slowest traced messages.
+        """
+        durations = defaultdict(list)
+        for trace in self.finished:
+            for stage in trace['stages']:
+                durations[stage['stage']].append(stage['elapsed'])
+        if not durations:
+            return ["No traces recorded."]
+        rows = []
+        for stage, values in durations.items():
+            values.sort()
+            p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+            rows.append((p95, stage, len(values), sum(values) / len(values), values[-1]))
+        lines = [f"{'stage':<12} {'count':>6} {'avg ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for p95, stage, count, mean, worst in sorted(rows, reverse=True):
+            lines.append(f"{stage:<12} {count:>6} {mean * 1000:>9.1f} {p95 * 1000:>9.1f} {worst * 1000:>9.1f}")
+        for trace in sorted(self.finished, key=lambda trace: trace['total'], reverse=True)[:top]:
+            slowest = max(trace['stages'], key=lambda stage: stage['elapsed'])
+            lines.append(f"message {trace['message']} in {trace['source']}: {trace['total'] * 1000:.0f} ms total, "
+                         f"slowest stage {slowest['stage']} ({slowest['elapsed'] * 1000:.0f} ms)")
+        return lines
+
+tracer = Tracer()
+
 # ------------------------------------------------------------------------------
 # Gradient text function
 # ------------------------------------------------------------------------------
 def gradient_text(text, start_color, end_color, emoji=None):
+    if console.mode != 'color':
+        return f"{text} {emoji}" if emoji else text
+    return render_gradient(text, start_color, end_color, emoji)
+
+@functools.lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def render_gradient(text, start_color, end_color, emoji=None):
     start_r, start_g, start_b = start_color
     end_r, end_g, end_b = end_color
     gradient = []
@@ -103,6 +412,70 @@ def gradient_text(text, start_color, end_color, emoji=None):
         result += f" {emoji}"
     return result
 
+# ------------------------------------------------------------------------------
+# Console output: status lines printed off the event loop, repeats rate-limited
+# ------------------------------------------------------------------------------
+class ConsoleOutput:
+    def __init__(self, mode=OUTPUT_MODE, rate_interval=CONSOLE_RATE_INTERVAL):
+        self.mode = mode
+        self.rate_interval = rate_interval
+        self.lines = SimpleQueue()
+        self.last_shown = {}
+        self.suppressed = defaultdict(int)
+        self.thread = None
+
+    def status(self, text, start_color, end_color, emoji=None, key=None):
+        """
+        Queues a status line for the printer thread. Lines with the same key are
+        shown at most once per rate_interval; the next one shown counts the skipped.
+        """
+        if self.mode == 'quiet':
+            return
+        if key is not None:
+            now = time.monotonic()
+            if now - self.last_shown.get(key, 0) < self.rate_interval:
+                self.suppressed[key] += 1
+                return
+            self.last_shown[key] = now
+            skipped = self.suppressed.pop(key, 0)
+            if skipped:
+                text = f"{text} (+{skipped} more)"
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+        self.lines.put((text, start_color, end_color, emoji))
+
+    def run(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                break
+            text, start_color, end_color, emoji = line
+            if self.mode == 'json':
+                print(json.dumps({'time': datetime.now().isoformat(timespec='seconds'), 'message': text}), flush=True)
+            else:
+                print(gradient_text(text, start_color, end_color, emoji), flush=True)
+
+    def close(self):
+        if self.thread is not None:
+            self.lines.put(None)
+            self.thread.join(timeout=1)
+            self.thread = None
+
+console = ConsoleOutput()
+
+def configure_output(mode):
+    """
+    Switches the console between 'color', 'plain', 'quiet' and 'json' output.
+    """
+    console.mode = mode
+    for handler in logger.listener.handlers:
+        if not isinstance(handler, logging.FileHandler):
+            if mode == 'json':
+                handler.setFormatter(JsonFormatter())
+            handler.setLevel(logging.WARNING if mode == 'quiet' else logging.INFO)
+
 # ------------------------------------------------------------------------------
 # Animation function
 # ------------------------------------------------------------------------------
@@ -117,24 +490,87 @@ async def animated_transition(text, duration=0.5):
 # ------------------------------------------------------------------------------
 # Functions for encryption/decryption of credentials
 # ------------------------------------------------------------------------------
-def get_key(password):
+def get_key(password, salt=LEGACY_SALT, iterations=KDF_ITERATIONS):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
-        salt=b'soluify_salt',  # In production, use a random salt
-        iterations=100000,
+        salt=salt,
+        iterations=iterations,
     )
     return base64.urlsafe_b64encode(kdf.derive(password.encode()))
 
-def encrypt_data(data, password):
-    key = get_key(password)
-    f = Fernet(key)
-    return f.encrypt(json.dumps(data).encode())
+def parse_credentials(encrypted_data):
+    """
+    Returns (salt, iterations, token) of a credentials file. Files without a
+    header are bare Fernet tokens encrypted with the legacy fixed salt.
+    """
+    if encrypted_data.lstrip().startswith(b'{'):
+        envelope = json.loads(encrypted_data)
+        return (base64.b64decode(envelope['salt']), envelope['iterations'],
+                envelope['token'].encode())
+    return LEGACY_SALT, KDF_ITERATIONS, encrypted_data
+
+def encrypt_data(data, password=None, salt=None, key=None):
+    # A key already derived for `salt` skips the (slow) derivation from the password.
+    from cryptography.fernet import Fernet
+    salt = salt or os.urandom(16)
+    key = key or get_key(password, salt)
+    token = Fernet(key).encrypt(json.dumps(data).encode())
+    envelope = {'salt': base64.b64encode(salt).decode(), 'iterations': KDF_ITERATIONS, 'token': token.decode()}
+    return json.dumps(envelope).encode()
+
+def file_key(encrypted_data, password):
+    # The key a credentials file was encrypted with, derived from its own salt.
+    salt, iterations, _ = parse_credentials(encrypted_data)
+    return get_key(password, salt, iterations)
 
-def decrypt_data(encrypted_data, password):
-    key = get_key(password)
-    f = Fernet(key)
-    return json.loads(f.decrypt(encrypted_data).decode())
+def decrypt_data(encrypted_data, password=None, key=None):
+    from cryptography.fernet import Fernet
+    key = key or file_key(encrypted_data, password)
+    return json.loads(Fernet(key).decrypt(parse_credentials(encrypted_data)[2]).decode())
+
+def remembered_key(encrypted_data):
+    """
+    Returns the key stored by remember_key for this credentials file (same salt),
+    or None. Skips both the password prompt and the key derivation.
+    """
+    try:
+        with open(KEY_FILE, 'r') as f:
+            remembered = json.load(f)
+    except (OSError, ValueError):
+        return None
+    salt = parse_credentials(encrypted_data)[0]
+    return remembered['key'].encode() if remembered.get('salt') == base64.b64encode(salt).decode() else None
+
+def remember_key(encrypted_data, key):
+    # Anyone who can read this file can decrypt the credentials: it is only
+    # readable by the current user and removed together with them.
+    salt = parse_credentials(encrypted_data)[0]
+    fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'salt': base64.b64encode(salt).decode(), 'key': key.decode()}, f)
+
+def write_atomic(path, data):
+    """
+    Replaces a file with `data` (bytes) so that a crash leaves either the old
+    or the new content: writes a temporary file next to it, syncs it and
+    renames it over the old one. New files are only readable by the current
+    user; existing ones keep their permissions.
+    """
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with open(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        with contextlib.suppress(FileNotFoundError):
+            shutil.copymode(path, partial)
+        os.replace(partial, path)
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(partial)
 
 # ------------------------------------------------------------------------------
 # Store/read bot credentials (for bot client) – these can be encrypted if desired
@@ -159,8 +595,7 @@ def store_credentials():
             'bot_token': bot_token
         }
         encrypted_data = encrypt_data(credentials, password)
-        with open(CREDENTIALS_FILE, 'wb') as f:
-            f.write(encrypted_data)
+        write_atomic(CREDENTIALS_FILE, encrypted_data)
         print(gradient_text("Credentials saved and encrypted.", SUCCESS_COLOR, SUCCESS_COLOR, "🔐"))
     else:
         print(gradient_text("Credentials will not be permanently saved.", MAIN_COLOR_START, MAIN_COLOR_END))
@@ -169,11 +604,26 @@ def store_credentials():
 def read_credentials():
     if not os.path.exists(CREDENTIALS_FILE):
         return None, None, None
-    password = getpass.getpass(gradient_text("Enter your password to decrypt your bot credentials: ", PROMPT_COLOR_START, PROMPT_COLOR_END))
     try:
         with open(CREDENTIALS_FILE, 'rb') as f:
             encrypted_data = f.read()
-        credentials = decrypt_data(encrypted_data, password)
+        key = remembered_key(encrypted_data)
+        if key is not None:
+            credentials = decrypt_data(encrypted_data, key=key)
+        else:
+            password = getpass.getpass(gradient_text("Enter your password to decrypt your bot credentials: ", PROMPT_COLOR_START, PROMPT_COLOR_END))
+            # Derive the key once and reuse it; only the salt upgrade needs a second one.
+            key = file_key(encrypted_data, password)
+            credentials = decrypt_data(encrypted_data, key=key)
+            if parse_credentials(encrypted_data)[0] == LEGACY_SALT:
+                # Upgrade old files to a random per-file salt.
+                salt = os.urandom(16)
+                key = get_key(password, salt)
+                encrypted_data = encrypt_data(credentials, salt=salt, key=key)
+                write_atomic(CREDENTIALS_FILE, encrypted_data)
+            remember = input(gradient_text("Remember the password on this device, so restarts skip it? (y/n): ", PROMPT_COLOR_START, PROMPT_COLOR_END))
+            if remember.strip().lower() == 'y':
+                remember_key(encrypted_data, key)
         print(gradient_text("Credentials decrypted! Welcome back!", SUCCESS_COLOR, SUCCESS_COLOR, "🎉"))
         return credentials['api_id'], credentials['api_hash'], credentials['bot_token']
     except Exception as e:
@@ -196,11 +646,969 @@ def get_user_credentials():
 # ------------------------------------------------------------------------------
 def exit_listener(forwarder):
     # Wait for user input; if "exit" is typed, stop forwarding.
+    # "stop <profile>" / "start <profile>" pause or resume a single profile.
     while forwarder.running:
         line = input()
-        if line.strip().lower() == "exit":
+        command, _, argument = line.strip().partition(' ')
+        command = command.lower()
+        if command == "exit":
             forwarder.running = False
             break
+        elif command in ("stop", "start"):
+            label = argument.strip()
+            if command == "stop":
+                found, state = forwarder.stop_profile(label), "stopped"
+            else:
+                found, state = forwarder.start_profile(label), "started"
+            if found:
+                print(gradient_text(f"Profile '{label}' {state}.", SUCCESS_COLOR, SUCCESS_COLOR))
+            else:
+                print(gradient_text(f"Unknown profile '{label}'.", ALERT_COLOR, ALERT_COLOR))
+        elif command == "status":
+            for label, profile in forwarder.profiles.items():
+                state = "running" if profile.running else "stopped"
+                print(gradient_text(f"{label}: {state}", MAIN_COLOR_START, MAIN_COLOR_END))
+            print(gradient_text(f"Queued sends: {forwarder.scheduler.queue_depth()}", MAIN_COLOR_START, MAIN_COLOR_END))
+            print(gradient_text(f"Metrics: {forwarder.metrics.summary()}", MAIN_COLOR_START, MAIN_COLOR_END))
+            if forwarder.supervisor:
+                for line in forwarder.supervisor.summary():
+                    print(gradient_text(line, MAIN_COLOR_START, MAIN_COLOR_END))
+        elif command == "trace":
+            for line in tracer.summary():
+                print(gradient_text(line, MAIN_COLOR_START, MAIN_COLOR_END))
+        elif command == "routes" and argument.strip().lstrip('-').isdigit():
+            # Which saved profiles read a source chat, and whether they run here.
+            for name in profile_store.profiles_for_source(int(argument)):
+                profile = forwarder.profiles.get(name)
+                state = "running" if profile and profile.running else "stopped" if profile else "not loaded"
+                print(gradient_text(f"{name}: {state}", MAIN_COLOR_START, MAIN_COLOR_END))
+
+# ------------------------------------------------------------------------------
+# Filter engine: keywords and blacklist compiled once per profile
+# ------------------------------------------------------------------------------
+def compile_word_matcher(words):
+    """
+    Compiles a list of words into a single alternation regex that is matched
+    against lowercased text, or returns None for an empty list.
+    """
+    words = sorted({word.lower() for word in words if word}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+class FilterEngine:
+    def __init__(self, keywords, blacklist):
+        self.keyword_regex = compile_word_matcher(keywords or [])
+        self.blacklist_regex = compile_word_matcher(blacklist or [])
+
+    def matches(self, text):
+        """
+        True if the text contains a keyword (or no keywords are set) and no
+        blacklisted word. The text is lowercased only once.
+        """
+        lowered = text.lower() if text else ""
+        if self.keyword_regex and not self.keyword_regex.search(lowered):
+            return False
+        if self.blacklist_regex and self.blacklist_regex.search(lowered):
+            return False
+        return True
+
+# ------------------------------------------------------------------------------
+# Forwarding profile: one routing rule (sources -> destinations + filters)
+# ------------------------------------------------------------------------------
+class ForwardingProfile:
+    def __init__(self, name, source_chat_ids, destination_channel_ids, keywords=None, signature='', blacklist=None):
+        self.name = name
+        self.source_chat_ids = list(source_chat_ids)
+        self.destination_channel_ids = list(destination_channel_ids)
+        self.keywords = keywords or []
+        self.signature = signature or ''
+        self.blacklist = blacklist or []
+        self.filter = FilterEngine(self.keywords, self.blacklist)
+        # Per source chat: the id up to which every message was dispatched, the ids
+        # above it that were pushed ahead of a gap, and the messages whose sends are
+        # still queued (see TelegramForwarder.mark_dispatched and track_delivery).
+        self.last_message_ids = {}
+        self.seen_ids = defaultdict(set)
+        self.deliveries = defaultdict(deque)
+        self.running = True
+        # Saved settings the profile was built from (see TelegramForwarder.reload_profiles).
+        self.config = None
+
+    @classmethod
+    def from_config(cls, name, config):
+        profile = cls(name, config['source_chat_ids'], config['destination_channel_ids'],
+                      config.get('keywords', []), config.get('signature', ''), config.get('blacklist', []))
+        profile.config = config
+        return profile
+
+    @property
+    def label(self):
+        return self.name or 'unsaved'
+
+# ------------------------------------------------------------------------------
+# State database (shared by the worker processes of a sharded deployment)
+# ------------------------------------------------------------------------------
+def connect_state_db(path):
+    """
+    Opens the SQLite state database in WAL mode, so workers can read while
+    another one writes; writers wait up to SQLITE_BUSY_TIMEOUT for each other.
+    """
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT)
+    if path != ':memory:':
+        conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+# ------------------------------------------------------------------------------
+# Checkpoint store: last forwarded message id per (profile, source chat)
+# ------------------------------------------------------------------------------
+class CheckpointStore:
+    def __init__(self, path=STATE_FILE, flush_every=CHECKPOINT_FLUSH_EVERY,
+                 flush_interval=CHECKPOINT_FLUSH_INTERVAL):
+        self.conn = connect_state_db(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "profile TEXT NOT NULL, source INTEGER NOT NULL, last_id INTEGER NOT NULL, "
+            "updated REAL NOT NULL, PRIMARY KEY (profile, source))"
+        )
+        self.conn.commit()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+    def get(self, profile, source):
+        """
+        Returns the last forwarded message id, or None if the source was never seen.
+        """
+        if (profile, source) in self.pending:
+            return self.pending[(profile, source)]
+        row = self.conn.execute(
+            "SELECT last_id FROM checkpoints WHERE profile = ? AND source = ?", (profile, source)
+        ).fetchone()
+        return row[0] if row else None
+
+    def update(self, profile, source, last_id):
+        """
+        Records progress in memory; it is written to disk in batches.
+        """
+        self.pending[(profile, source)] = last_id
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if self.pending and (len(self.pending) >= self.flush_every
+                             or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            now = time.time()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO checkpoints (profile, source, last_id, updated) VALUES (?, ?, ?, ?)",
+                [(profile, source, last_id, now) for (profile, source), last_id in self.pending.items()]
+            )
+            self.conn.commit()
+            self.pending.clear()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# ------------------------------------------------------------------------------
+# Dedup cache: content already forwarded by a profile within the window
+# ------------------------------------------------------------------------------
+class DedupCache:
+    def __init__(self, path=STATE_FILE, window=DEDUP_WINDOW, max_entries=DEDUP_CACHE_SIZE,
+                 flush_every=CHECKPOINT_FLUSH_EVERY, flush_interval=CHECKPOINT_FLUSH_INTERVAL, shared=False):
+        self.window = window
+        # Other processes write to the same database: check it on a miss.
+        self.shared = shared
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.reserved = set()
+        self.last_flush = time.monotonic()
+        self.conn = connect_state_db(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup (key TEXT PRIMARY KEY, seen REAL NOT NULL)"
+        )
+        # Forget expired entries and load the rest, oldest first, for the LRU order.
+        self.prune()
+        rows = self.conn.execute(
+            "SELECT key, seen FROM (SELECT key, seen FROM dedup ORDER BY seen DESC LIMIT ?) ORDER BY seen",
+            (max_entries,)
+        ).fetchall()
+        self.entries.update(rows)
+
+    def seen(self, scope, key):
+        """
+        Returns True if the key was already recorded for the scope within the
+        window, or is reserved by a message still being delivered. Otherwise
+        reserves it (in memory only) and returns False; confirm records it once
+        the message was sent, release frees it if the delivery failed.
+        """
+        if not self.window or key is None:
+            return False
+        key = f"{scope}:{key}"
+        if key in self.reserved:
+            return True
+        seen_at = self.entries.get(key)
+        if seen_at is None and self.shared:
+            row = self.conn.execute("SELECT seen FROM dedup WHERE key = ?", (key,)).fetchone()
+            seen_at = row[0] if row else None
+        if seen_at is not None and time.time() - seen_at < self.window:
+            self.entries.move_to_end(key)
+            return True
+        self.reserved.add(key)
+        return False
+
+    def confirm(self, scope, key):
+        if not self.window or key is None:
+            return
+        key = f"{scope}:{key}"
+        self.reserved.discard(key)
+        now = time.time()
+        self.entries[key] = now
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.pending[key] = now
+        self.maybe_flush()
+
+    def release(self, scope, key):
+        if key is not None:
+            self.reserved.discard(f"{scope}:{key}")
+
+    def maybe_flush(self):
+        if self.pending and (len(self.pending) >= self.flush_every
+                             or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.conn.executemany("INSERT OR REPLACE INTO dedup (key, seen) VALUES (?, ?)",
+                                  list(self.pending.items()))
+            self.conn.commit()
+            self.pending.clear()
+        self.last_flush = time.monotonic()
+        if self.last_flush - self.last_prune >= DEDUP_PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        # Expired entries would otherwise pile up in the database of a long-running daemon.
+        self.conn.execute("DELETE FROM dedup WHERE seen < ?", (time.time() - self.window,))
+        self.conn.commit()
+        self.last_prune = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# ------------------------------------------------------------------------------
+# Dialog cache: the reader's chats (id, title, type, last message id) for listing/search
+# ------------------------------------------------------------------------------
+class DialogCache:
+    def __init__(self, path=STATE_FILE):
+        self.conn = connect_state_db(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dialogs ("
+            "id INTEGER PRIMARY KEY, title TEXT NOT NULL, search_title TEXT NOT NULL, "
+            "type TEXT NOT NULL, last_message_id INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        # Searches match anywhere in the title, which no index can serve: they scan the
+        # table, which is only as large as the reader's chat list.
+        self.conn.execute("DROP INDEX IF EXISTS dialogs_search")
+        self.conn.commit()
+
+    def last_message_id(self, chat_id):
+        row = self.conn.execute("SELECT last_message_id FROM dialogs WHERE id = ?", (chat_id,)).fetchone()
+        return row[0] if row else None
+
+    def store(self, rows):
+        """
+        Saves (id, title, type, last_message_id) rows.
+        """
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO dialogs (id, title, search_title, type, last_message_id, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(chat_id, title, title.casefold(), chat_type, last_id, now) for chat_id, title, chat_type, last_id in rows]
+        )
+        self.conn.commit()
+
+    def all(self, exclude=()):
+        return [row for row in self.conn.execute("SELECT id, title, type, last_message_id FROM dialogs ORDER BY title")
+                if row[0] not in exclude]
+
+    def search(self, text, limit=50):
+        """
+        Returns cached chats whose title contains text (case-insensitive).
+        """
+        pattern = '%' + text.casefold().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return self.conn.execute(
+            "SELECT id, title, type, last_message_id FROM dialogs WHERE search_title LIKE ? ESCAPE '\\' "
+            "ORDER BY title LIMIT ?", (pattern, limit)
+        ).fetchall()
+
+    def prune(self, keep):
+        """
+        Drops chats the reader is no longer in (after a complete listing).
+        """
+        stale = [(row[0],) for row in self.conn.execute("SELECT id FROM dialogs") if row[0] not in keep]
+        self.conn.executemany("DELETE FROM dialogs WHERE id = ?", stale)
+        self.conn.commit()
+
+    def oldest_update(self):
+        """
+        Time of the least recently refreshed chat, or None if the cache is empty.
+        """
+        return self.conn.execute("SELECT MIN(updated) FROM dialogs").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+def dialog_type(dialog):
+    if dialog.is_user:
+        return 'user'
+    return 'group' if dialog.is_group else 'channel'
+
+# ------------------------------------------------------------------------------
+# Send scheduler: token buckets per destination and globally, FloodWait per chat
+# ------------------------------------------------------------------------------
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class SendScheduler:
+    """
+    Delivers sends through the sender client. Every destination has its own FIFO
+    queue and worker, so order is kept per chat and a FloodWait only pauses the
+    affected chat. Its bucket is then slowed down, recovering gradually on
+    success. A global bucket keeps the bot under its overall limit.
+    """
+    def __init__(self, max_concurrent_sends=MAX_CONCURRENT_SENDS, global_rate=GLOBAL_SEND_RATE,
+                 chat_rate=CHAT_SEND_RATE, chat_burst=CHAT_SEND_BURST, queue_size=SEND_QUEUE_SIZE):
+        self.semaphore = asyncio.Semaphore(max_concurrent_sends)
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.queue_size = queue_size
+        self.queues = {}
+        self.workers = {}
+        self.chat_buckets = {}
+        self.blocked_until = {}
+
+    async def submit(self, dest_id, send):
+        """
+        Queues send(dest_id) and returns a future with its result. Waits while the
+        destination queue is full, which pushes back on the producer.
+        """
+        if dest_id not in self.queues:
+            self.queues[dest_id] = asyncio.Queue(self.queue_size)
+            self.chat_buckets[dest_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            self.workers[dest_id] = asyncio.ensure_future(self.worker(dest_id))
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[dest_id].put((send, future))
+        return future
+
+    async def worker(self, dest_id):
+        queue = self.queues[dest_id]
+        while True:
+            send, future = await queue.get()
+            try:
+                result = await self.deliver(dest_id, send)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                metrics.inc('soluify_send_errors_total', destination=dest_id)
+                logger.error(f"Send to {dest_id} failed: {e}")
+                console.status(f"Send to {dest_id} failed: {e}", ALERT_COLOR, ALERT_COLOR, key='send_failed')
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                queue.task_done()
+
+    async def deliver(self, dest_id, send):
+        attempt = 0
+        offline_since = None
+        while True:
+            wait = self.blocked_until.get(dest_id, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.chat_buckets[dest_id].acquire()
+            await self.global_bucket.acquire()
+            try:
+                async with self.semaphore:
+                    with metrics.timer('soluify_send_seconds', destination=dest_id):
+                        result = await send(dest_id)
+            except FloodWaitError as e:
+                metrics.inc('soluify_flood_wait_seconds_total', e.seconds, scope='send')
+                if attempt == MAX_RETRIES:
+                    raise
+                attempt += 1
+                logger.error(f"Flood wait on chat {dest_id}: waiting {e.seconds} seconds, other chats continue.")
+                self.blocked_until[dest_id] = time.monotonic() + e.seconds
+                bucket = self.chat_buckets[dest_id]
+                bucket.rate = max(self.chat_rate / 8, bucket.rate / 2)
+                continue
+            except ConnectionError as e:
+                # The bot is offline; the connection supervisor is bringing it back.
+                # The send waits for it as long as one reconnect pause may take.
+                if offline_since is None:
+                    offline_since = time.monotonic()
+                if time.monotonic() - offline_since >= RECONNECT_MAX_DELAY:
+                    raise
+                logger.error(f"Send to {dest_id} failed while disconnected: {e}. Retrying in {RETRY_DELAY} seconds.")
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            bucket = self.chat_buckets[dest_id]
+            bucket.rate = min(self.chat_rate, bucket.rate + self.chat_rate / 10)
+            return result
+
+    def queue_depth(self, dest_id=None):
+        """
+        Sends waiting in the queue of one destination, or of all destinations.
+        """
+        if dest_id is not None:
+            queue = self.queues.get(dest_id)
+            return queue.qsize() if queue else 0
+        return sum(queue.qsize() for queue in self.queues.values())
+
+    async def drain(self):
+        """
+        Waits until every queued send has been delivered (or has failed).
+        """
+        for queue in list(self.queues.values()):
+            await queue.join()
+
+    async def close(self):
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.queues.clear()
+        self.workers.clear()
+
+# ------------------------------------------------------------------------------
+# Media relay: download each file once, upload it once, reuse it for every chat
+# ------------------------------------------------------------------------------
+def media_file_name(message):
+    file = message.file
+    if file is None:
+        return None
+    return file.name or f"media{file.ext or ''}"
+
+def media_unique_id(message):
+    # Photo/document ids stay the same when a file is reposted or forwarded.
+    media = getattr(message, 'photo', None) or getattr(message, 'document', None)
+    return str(media.id) if media is not None else None
+
+def media_file_size(message):
+    return getattr(message.file, 'size', None) if message.file is not None else None
+
+def media_attributes(message):
+    return message.document.attributes if message.document else None
+
+# ------------------------------------------------------------------------------
+# Media cache: downloaded files by photo/document id, evicted least recently used
+# ------------------------------------------------------------------------------
+class MediaCache:
+    def __init__(self, directory=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # File sizes by media id, least recently used first.
+        self.entries = OrderedDict()
+        if os.path.isdir(directory):
+            files = [entry for entry in os.scandir(directory) if entry.is_file()]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                if entry.name.endswith('.part'):
+                    os.remove(entry.path)
+                    continue
+                self.entries[entry.name] = entry.stat().st_size
+                self.total_bytes += entry.stat().st_size
+            self.evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Returns the path of a cached file and marks it as recently used, or None.
+        A file deleted behind the cache's back counts as a miss.
+        """
+        if key not in self.entries:
+            return None
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            self.total_bytes -= self.entries.pop(key)
+            return None
+        except OSError:
+            pass
+        self.entries.move_to_end(key)
+        return self.path(key)
+
+    async def store(self, key, fill):
+        """
+        Creates a cache file by awaiting fill(file_object). The file only becomes
+        visible under its key once fill succeeded (returned something not None).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, partial = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with open(fd, 'wb') as file:
+                if await fill(file) is None:
+                    return None
+            os.replace(partial, self.path(key))
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(partial)
+        size = os.path.getsize(self.path(key))
+        self.total_bytes += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+        self.evict(keep=key)
+        return self.path(key)
+
+    def evict(self, keep=None):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            if key == keep:
+                break
+            self.total_bytes -= self.entries.pop(key)
+            # A file still being uploaded stays readable (or is removed next time).
+            with contextlib.suppress(OSError):
+                os.remove(self.path(key))
+            metrics.inc('soluify_media_cache_evictions_total')
+
+class MediaRelay:
+    def __init__(self, reader_client, sender_client, buffer_mode=MEDIA_BUFFER, cache=None,
+                 max_concurrent_downloads=MAX_CONCURRENT_DOWNLOADS, part_size=DOWNLOAD_PART_SIZE,
+                 parallel_parts=DOWNLOAD_PARALLEL_PARTS):
+        self.reader = reader_client
+        self.sender = sender_client
+        self.buffer_mode = buffer_mode
+        self.cache = cache
+        self.download_slots = asyncio.Semaphore(max_concurrent_downloads)
+        self.part_size = part_size
+        self.parallel_parts = parallel_parts
+        # Downloads in progress by media id, so concurrent requests share one.
+        self.fetching = {}
+        # Handles of recent uploads, so profiles sharing a source (or a reposted
+        # file) reuse them.
+        self.recent_uploads = OrderedDict()
+
+    async def upload(self, message, sender=None):
+        """
+        Downloads the media of a message with the reader client and uploads it once
+        with a sender client (the default sender if None). Returns the uploaded file
+        handle, which that sender can pass to send_file for any number of destinations,
+        or None if there is nothing to relay. Temporary data is always removed before returning.
+        """
+        sender = sender or self.sender
+        return (await self.upload_all(message, [sender]))[sender]
+
+    async def upload_all(self, message, senders):
+        """
+        Uploads the media of a message with every sender client that has no handle
+        for it yet (handles belong to the uploading bot), downloading it only once.
+        Returns the handles by sender.
+        """
+        media_id = media_unique_id(message)
+        key = media_id if media_id is not None else (message.chat_id, message.id)
+        missing = [sender for sender in senders if (sender, key) not in self.recent_uploads]
+        if missing:
+            uploads = await self.transfer(message, missing)
+            tracer.mark(message.chat_id, message.id, 'upload', bots=len(uploads))
+            for sender, uploaded in uploads.items():
+                if uploaded is not None:
+                    self.recent_uploads[(sender, key)] = uploaded
+            while len(self.recent_uploads) > RECENT_UPLOADS_SIZE:
+                self.recent_uploads.popitem(last=False)
+        return {sender: self.recent_uploads.get((sender, key)) for sender in senders}
+
+    async def download(self, message, file):
+        """
+        Writes the media of a message into a seekable file object. Media of a known
+        size is fetched in DOWNLOAD_PART_SIZE requests, large files as several
+        1 MiB-aligned ranges at once. Returns None if there was nothing to download.
+        """
+        size = media_file_size(message)
+        # File references belong to the account that fetched the message.
+        reader = getattr(message, '_client', None) or self.reader
+        async with self.download_slots:
+            with metrics.timer('soluify_download_seconds'):
+                if not size:
+                    result = await reader.download_media(message.media, file=file)
+                else:
+                    result = await self.download_ranges(reader, message, file, size)
+        if result is not None:
+            metrics.inc('soluify_download_bytes_total', size or 0)
+            tracer.mark(message.chat_id, message.id, 'download', bytes=size)
+        return result
+
+    async def download_ranges(self, reader, message, file, size):
+        # Telegram requires each request to stay within one 1 MiB block; ranges
+        # are whole blocks and the part size divides 1 MiB, so none crosses one.
+        block = 1024 * 1024
+        span = max(1, -(-size // (block * self.parallel_parts))) * block
+
+        async def fetch(start):
+            position = start
+            chunks = -(-min(span, size - start) // self.part_size)
+            async for chunk in reader.iter_download(message.media, offset=start, limit=chunks,
+                                                         request_size=self.part_size, file_size=size):
+                file.seek(position)
+                file.write(chunk)
+                position += len(chunk)
+
+        await asyncio.gather(*(fetch(start) for start in range(0, size, span)))
+        file.seek(size)
+        return file
+
+    async def fetch_cached(self, message, media_id):
+        """
+        Returns the cache path of a media file, downloading it at most once even if
+        several workers ask for it at the same time.
+        """
+        path = self.cache.get(media_id)
+        if path is not None:
+            metrics.inc('soluify_media_cache_hits_total')
+            return path
+        if media_id not in self.fetching:
+            self.fetching[media_id] = asyncio.ensure_future(
+                self.cache.store(media_id, lambda file: self.download(message, file)))
+            self.fetching[media_id].add_done_callback(lambda _: self.fetching.pop(media_id, None))
+        return await asyncio.shield(self.fetching[media_id])
+
+    async def upload_once(self, senders, file, file_name, file_size=None):
+        uploads = {}
+        for sender in senders:
+            if hasattr(file, 'seek'):
+                file.seek(0)
+            with metrics.timer('soluify_upload_seconds'):
+                uploads[sender] = await sender.upload_file(file, file_size=file_size, file_name=file_name)
+            metrics.inc('soluify_upload_bytes_total', getattr(uploads[sender], 'size', None) or file_size or 0)
+        return uploads
+
+    async def transfer(self, message, senders):
+        file_name = media_file_name(message)
+        if file_name is None:
+            return {}
+        media_id = media_unique_id(message)
+        if self.cache is not None and media_id is not None:
+            path = await self.fetch_cached(message, media_id)
+            if path is None:
+                return {}
+            return await self.upload_once(senders, path, file_name, os.path.getsize(path))
+        if self.buffer_mode == 'memory':
+            buffer = io.BytesIO()
+            if await self.download(message, buffer) is None:
+                return {}
+            data = buffer.getvalue()
+            return await self.upload_once(senders, data, file_name, len(data))
+        if self.buffer_mode == 'spool':
+            with tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MAX_SIZE) as spool:
+                if await self.download(message, spool) is None:
+                    return {}
+                return await self.upload_once(senders, spool, file_name, spool.tell())
+        directory = tempfile.mkdtemp(prefix='soluify_')
+        try:
+            media_path = os.path.join(directory, os.path.basename(file_name) or 'media')
+            with open(media_path, 'wb') as file:
+                if await self.download(message, file) is None:
+                    return {}
+            return await self.upload_once(senders, media_path, file_name, os.path.getsize(media_path))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+# ------------------------------------------------------------------------------
+# Reader pool: source chats spread over several user accounts
+# ------------------------------------------------------------------------------
+class ReaderPool:
+    """
+    Stands in for the reader client. Every source chat is read by one account,
+    picked by consistent hashing; an account that is flood-limited or disconnected
+    hands its chats to the next account on the ring until it is available again.
+    All accounts must be members of the source chats.
+    """
+    def __init__(self, clients, replicas=READER_RING_REPLICAS):
+        self.clients = list(clients)
+        self.limited_until = {}
+        self.handlers = {}
+        self.ring = sorted((self.ring_hash(f"{index}:{replica}"), index)
+                           for index in range(len(self.clients)) for replica in range(replicas))
+        self.ring_keys = [point for point, _ in self.ring]
+
+    @staticmethod
+    def ring_hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+    def available(self, client):
+        return client.is_connected() and self.limited_until.get(client, 0) <= time.monotonic()
+
+    def client_for(self, chat_id):
+        """
+        Returns the account reading a chat, or None if every account is unavailable.
+        """
+        start = bisect.bisect(self.ring_keys, self.ring_hash(chat_id))
+        for offset in range(len(self.ring)):
+            client = self.clients[self.ring[(start + offset) % len(self.ring)][1]]
+            if self.available(client):
+                return client
+        return None
+
+    def any_client(self):
+        return next((client for client in self.clients if self.available(client)), self.clients[0])
+
+    def limit(self, client, seconds):
+        self.limited_until[client] = time.monotonic() + seconds
+        metrics.inc('soluify_flood_wait_seconds_total', seconds, scope='read')
+        logger.info(f"Reader account {self.clients.index(client) + 1} is flood-limited for {seconds}s, rebalancing")
+
+    async def get_messages(self, entity, *args, **kwargs):
+        while True:
+            client = self.client_for(entity) or self.any_client()
+            try:
+                return await client.get_messages(entity, *args, **kwargs)
+            except FloodWaitError as e:
+                self.limit(client, e.seconds)
+                if self.client_for(entity) is None:
+                    raise
+
+    async def iter_messages(self, entity, *args, min_id=0, reverse=False, **kwargs):
+        # Oldest-first reads resume after the last yielded message on another account.
+        while True:
+            client = self.client_for(entity) or self.any_client()
+            try:
+                async for message in client.iter_messages(entity, *args, min_id=min_id, reverse=reverse, **kwargs):
+                    if reverse:
+                        min_id = message.id
+                    yield message
+                return
+            except FloodWaitError as e:
+                self.limit(client, e.seconds)
+                if not reverse or self.client_for(entity) is None:
+                    raise
+
+    async def get_dialogs(self, *args, **kwargs):
+        return await self.any_client().get_dialogs(*args, **kwargs)
+
+    def iter_dialogs(self, *args, **kwargs):
+        return self.any_client().iter_dialogs(*args, **kwargs)
+
+    async def download_media(self, *args, **kwargs):
+        return await self.any_client().download_media(*args, **kwargs)
+
+    def iter_download(self, *args, **kwargs):
+        return self.any_client().iter_download(*args, **kwargs)
+
+    def add_event_handler(self, callback, event):
+        # Every account sees the updates of the chats it is in; only the account
+        # currently reading a chat passes them on.
+        wrappers = []
+        for client in self.clients:
+            async def owned(update, client=client):
+                if self.client_for(update.chat_id) is client:
+                    await callback(update)
+            client.add_event_handler(owned, event)
+            wrappers.append((client, owned))
+        self.handlers.setdefault(callback, []).extend(wrappers)
+
+    def remove_event_handler(self, callback):
+        for client, owned in self.handlers.pop(callback, []):
+            client.remove_event_handler(owned)
+
+    def is_connected(self):
+        return any(client.is_connected() for client in self.clients)
+
+    async def connect(self):
+        errors = []
+        for client in self.clients:
+            if not client.is_connected():
+                try:
+                    await client.connect()
+                except Exception as e:
+                    logger.error(f"Error connecting reader account {self.clients.index(client) + 1}: {e}")
+                    errors.append(e)
+        if len(errors) == len(self.clients):
+            raise errors[0]
+
+    async def disconnect(self):
+        for client in self.clients:
+            await client.disconnect()
+
+# ------------------------------------------------------------------------------
+# Sender pool: destination chats spread over several bots
+# ------------------------------------------------------------------------------
+class SenderPool:
+    """
+    Sends through one of several bots (all admins in the destination chats). Each
+    destination sticks to the least loaded bot when first used, so its messages
+    stay in order; on a FloodWait or disconnect it fails over to another bot of the pool.
+    """
+    def __init__(self, clients):
+        self.clients = list(clients)
+        self.assignments = {}
+        self.load = {client: 0 for client in self.clients}
+        # (bot, destination) pairs that got a FloodWait, until when.
+        self.limited_until = {}
+
+    def available(self, client, dest_id):
+        return client.is_connected() and self.limited_until.get((client, dest_id), 0) <= time.monotonic()
+
+    def client_for(self, dest_id):
+        """
+        Returns the bot assigned to a destination, moving the destination to the
+        least loaded other bot if the assigned one is flood-limited there.
+        """
+        client = self.assignments.get(dest_id)
+        if client is not None and self.available(client, dest_id):
+            return client
+        candidates = [other for other in self.clients if self.available(other, dest_id)]
+        if not candidates:
+            return client or self.clients[0]
+        chosen = min(candidates, key=lambda other: self.load[other])
+        if client is not None:
+            self.load[client] -= 1
+            metrics.inc('soluify_sender_failovers_total')
+            logger.info(f"Destination {dest_id} moved to bot {self.clients.index(chosen) + 1}")
+        self.assignments[dest_id] = chosen
+        self.load[chosen] += 1
+        return chosen
+
+    async def send_via(self, dest_id, send):
+        """
+        Awaits send(client) with the bot of a destination. A FloodWait is only
+        raised (for the scheduler to wait it out) if no other bot is available.
+        """
+        while True:
+            client = self.client_for(dest_id)
+            try:
+                return await send(client)
+            except FloodWaitError as e:
+                self.limited_until[(client, dest_id)] = time.monotonic() + e.seconds
+                if not any(self.available(other, dest_id) for other in self.clients):
+                    raise
+                metrics.inc('soluify_flood_wait_seconds_total', e.seconds, scope='send')
+
+# ------------------------------------------------------------------------------
+# Connection supervisor: keepalive probes and reconnects with backoff
+# ------------------------------------------------------------------------------
+class ConnectionSupervisor:
+    """
+    Keeps the reader and sender accounts connected. A dropped connection is
+    noticed within a second, a silently dead one by a keepalive request every
+    `interval` seconds. Reconnect attempts back off exponentially with jitter, and
+    on_reconnect(name) is called once an account is back.
+    """
+    def __init__(self, clients, on_reconnect=None, interval=HEALTH_CHECK_INTERVAL, timeout=HEALTH_CHECK_TIMEOUT,
+                 base_delay=RECONNECT_BASE_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        # Account name -> client.
+        self.clients = dict(clients)
+        self.on_reconnect = on_reconnect
+        self.interval = interval
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.states = {name: 'connected' for name in self.clients}
+        self.since = {name: time.time() for name in self.clients}
+        self.reconnects = defaultdict(int)
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [asyncio.ensure_future(self.watch(name, client)) for name, client in self.clients.items()]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def set_state(self, name, state):
+        if self.states[name] != state:
+            self.states[name] = state
+            self.since[name] = time.time()
+
+    def down(self):
+        return sum(state != 'connected' for state in self.states.values())
+
+    def summary(self):
+        lines = []
+        for name, state in self.states.items():
+            since = datetime.fromtimestamp(self.since[name]).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"{name}: {state} since {since} ({self.reconnects[name]} reconnects)")
+        return lines
+
+    async def probe(self, client):
+        """
+        Sends a cheap request; False if it fails or gets no answer in time.
+        """
+        try:
+            await asyncio.wait_for(client.get_me(), self.timeout)
+        except FloodWaitError:
+            pass  # Rate-limited, but the connection works.
+        except Exception:
+            return False
+        return True
+
+    async def watch(self, name, client):
+        last_probe = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            healthy = client.is_connected()
+            if healthy and time.monotonic() - last_probe >= self.interval:
+                healthy = await self.probe(client)
+                last_probe = time.monotonic()
+            if not healthy:
+                await self.reconnect(name, client)
+                last_probe = time.monotonic()
+
+    async def reconnect(self, name, client):
+        logger.error(f"Connection of {name} lost, reconnecting...")
+        console.status(f"Connection of {name} lost, reconnecting...", ALERT_COLOR, ALERT_COLOR, key=('connection', name))
+        self.set_state(name, 'reconnecting')
+        attempt = 0
+        while True:
+            try:
+                if client.is_connected():
+                    # Connected but not answering: start over with a fresh connection.
+                    await asyncio.wait_for(client.disconnect(), self.timeout)
+                await asyncio.wait_for(client.connect(), self.timeout)
+                if await self.probe(client):
+                    break
+            except Exception as e:
+                logger.error(f"Reconnecting {name} failed: {e}")
+            attempt += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            # Jitter keeps several accounts (or processes) from retrying in lockstep.
+            await asyncio.sleep(delay / 2 + random.uniform(0, delay / 2))
+        outage = time.time() - self.since[name]
+        self.set_state(name, 'connected')
+        self.reconnects[name] += 1
+        metrics.inc('soluify_reconnects_total', client=name)
+        logger.info(f"{name} reconnected after {outage:.1f}s")
+        console.status(f"{name} reconnected after {outage:.1f}s.", SUCCESS_COLOR, SUCCESS_COLOR, "🔄")
+        if self.on_reconnect:
+            self.on_reconnect(name)
 
 # ------------------------------------------------------------------------------
 # Class for message forwarding using two clients:
@@ -208,10 +1616,61 @@ def exit_listener(forwarder):
 # Now with improved text cleaning to remove complex signatures.
 # ------------------------------------------------------------------------------
 class TelegramForwarder:
-    def __init__(self, reader_client, sender_client):
+    def __init__(self, reader_client, sender_client, ingest_mode=INGEST_MODE,
+                 max_concurrent_sends=MAX_CONCURRENT_SENDS, media_buffer=MEDIA_BUFFER,
+                 checkpoint_store=None, max_catchup=MAX_CATCHUP_MESSAGES, metrics_port=METRICS_PORT,
+                 dedup_cache=None, filter_workers=FILTER_WORKERS, media_workers=MEDIA_WORKERS,
+                 global_send_rate=None, shard=None):
         self.reader = reader_client
-        self.sender = sender_client
+        self.senders = sender_client if isinstance(sender_client, SenderPool) else SenderPool([sender_client])
+        self.sender = self.senders.clients[0]
+        cache = None
+        if MEDIA_CACHE_MAX_BYTES and shard:
+            # Workers clean up and evict their cache on their own: one directory
+            # and a share of the size limit each.
+            cache = MediaCache(os.path.join(MEDIA_CACHE_DIR, f'worker-{shard[0]}'), MEDIA_CACHE_MAX_BYTES // shard[1])
+        elif MEDIA_CACHE_MAX_BYTES:
+            cache = MediaCache()
+        self.media_relay = MediaRelay(reader_client, self.sender, media_buffer, cache)
+        self.checkpoints = checkpoint_store or CheckpointStore()
+        self.dedup = dedup_cache or DedupCache()
+        self.max_catchup = max_catchup
+        # Active profiles by label, and the profiles reading each source chat.
+        self.profiles = {}
+        self.routes = defaultdict(list)
+        self.gap_fill_requested = False
+        # Saved profiles followed while running (see watch_profiles).
+        self.profile_store = None
+        self.watched_profiles = None
+        self.profile_version = None
+        self.last_profile_check = time.monotonic()
+        self.ingest_mode = ingest_mode
         self.running = False
+        # Set by a second shutdown signal: stop without draining the queues.
+        self.force_stop = asyncio.Event()
+        # Each bot has its own overall limit (split by the caller when processes share bots).
+        self.scheduler = SendScheduler(max_concurrent_sends,
+                                       global_send_rate or GLOBAL_SEND_RATE * len(self.senders.clients))
+        # (index, count): only the source chats of this shard are read (see owns).
+        self.shard = shard
+        # Pipeline stages: ingest -> filter/clean -> media fetch -> send (scheduler).
+        # Every stage has one bounded queue per worker; a source chat always maps to
+        # the same worker, so its messages keep their order.
+        self.filter_workers = filter_workers
+        self.media_workers = media_workers
+        self.filter_queues = []
+        self.media_queues = []
+        self.stage_tasks = []
+        self.metrics = metrics
+        self.metrics_port = metrics_port
+        self.metrics.gauge('soluify_send_queue_depth', lambda: self.scheduler.queue_depth())
+        self.metrics.gauge('soluify_ingest_queue_depth', lambda: sum(q.qsize() for q in self.filter_queues))
+        self.metrics.gauge('soluify_media_queue_depth', lambda: sum(q.qsize() for q in self.media_queues))
+        # Started by run_profiles once the clients are connected.
+        self.supervisor = None
+        self.metrics.gauge('soluify_disconnected_clients', lambda: self.supervisor.down() if self.supervisor else 0)
+        # Source chats that rejected a native copy (protected content).
+        self.restricted_chats = set()
         self.blacklist = []
         
         # Define regex patterns to match unwanted signature content.
@@ -222,11 +1681,16 @@ class TelegramForwarder:
             r'🕊\s*Twitter.*?(?=\n\n|$)',
             r'🌐\s*DAPP.*?(?=\n\n|$)'
         ]
-        # Compile each pattern as a regex (case-insensitive, dot matches newlines)
-        self.signature_regex = [re.compile(pattern, re.DOTALL | re.IGNORECASE) for pattern in self.signature_patterns]
+        # Merge all patterns into one regex (case-insensitive, dot matches newlines)
+        # so cleaning is a single pass over the text.
+        self.signature_regex = re.compile('|'.join(f'(?:{pattern})' for pattern in self.signature_patterns),
+                                          re.DOTALL | re.IGNORECASE)
+        self.clean_cache = OrderedDict()
+        # Opened on first use by list_chats/search_chats.
+        self.dialogs = None
 
     async def ensure_connections(self):
-        for client in (self.reader, self.sender):
+        for client in (self.reader, *self.senders.clients):
             if not client.is_connected():
                 try:
                     await client.connect()
@@ -235,25 +1699,74 @@ class TelegramForwarder:
                     return False
         return True
 
-    async def list_chats(self):
+    def supervised_clients(self):
+        """
+        Names the individual reader and sender accounts for the connection supervisor.
+        """
+        readers = self.reader.clients if isinstance(self.reader, ReaderPool) else [self.reader]
+        clients = {}
+        for index, client in enumerate(readers):
+            clients[f"reader {index + 1}" if len(readers) > 1 else "reader"] = client
+        bots = self.senders.clients
+        for index, client in enumerate(bots):
+            if client not in readers:
+                clients[f"bot {index + 1}" if len(bots) > 1 else "bot"] = client
+        return clients
+
+    def connection_restored(self, name):
+        # Updates pushed while the account was offline are lost; poll from the
+        # contiguous positions on the next tick of the ingest loop. Messages
+        # pushed after the reconnect sit above the gap in seen_ids and do not
+        # move the position past it.
+        self.gap_fill_requested = True
+
+    async def list_chats(self, full=False):
         """
         Lists chats from the reader client (user account) which has access to more chats.
+        Dialogs are streamed (most recently active first) into the dialog cache and
+        the chats file. Unless full is set, streaming stops once DIALOG_UNCHANGED_STOP
+        chats in a row have no new messages; the rest comes from the cache.
         """
         if not await self.ensure_connections():
             return
-        dialogs = await self.reader.get_dialogs()
-        filename = "chats_of_reader.txt"
-        with open(filename, "w") as chats_file, tqdm(
-            total=len(dialogs),
-            bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}",
-            ncols=75
+        if self.dialogs is None:
+            self.dialogs = DialogCache()
+        oldest = self.dialogs.oldest_update()
+        full = full or oldest is None or time.time() - oldest >= DIALOG_FULL_REFRESH_INTERVAL
+        seen = set()
+        rows = []
+        unchanged = 0
+        from tqdm import tqdm
+        with open(CHATS_FILE, "w") as chats_file, tqdm(
+            desc="Chats", bar_format="{desc}: {n_fmt}", ncols=75
         ) as pbar:
-            for dialog in dialogs:
-                chat_info = f"Chat ID: {dialog.id}, Title: {dialog.title}"
-                print(gradient_text(chat_info, MAIN_COLOR_START, MAIN_COLOR_END))
-                chats_file.write(chat_info + "\n")
+            async for dialog in self.reader.iter_dialogs():
+                last_id = dialog.message.id if dialog.message else 0
+                unchanged = unchanged + 1 if not dialog.pinned and self.dialogs.last_message_id(dialog.id) == last_id else 0
+                rows.append((dialog.id, dialog.title or '', dialog_type(dialog), last_id))
+                chats_file.write(f"Chat ID: {dialog.id}, Title: {dialog.title}\n")
+                seen.add(dialog.id)
+                pbar.update(1)
+                if len(rows) >= 100:
+                    self.dialogs.store(rows)
+                    rows = []
+                if not full and unchanged >= DIALOG_UNCHANGED_STOP:
+                    break
+            self.dialogs.store(rows)
+            if full:
+                self.dialogs.prune(keep=seen)
+            for chat_id, title, _, _ in self.dialogs.all(exclude=seen):
+                chats_file.write(f"Chat ID: {chat_id}, Title: {title}\n")
                 pbar.update(1)
-        print(gradient_text("Chat list written to file!", SUCCESS_COLOR, SUCCESS_COLOR, "🎉"))
+        print(gradient_text(f"Chat list written to {CHATS_FILE}!", SUCCESS_COLOR, SUCCESS_COLOR, "🎉"))
+
+    def search_chats(self, text):
+        """
+        Looks chats up by title in the dialog cache (filled by list_chats).
+        """
+        if self.dialogs is None:
+            self.dialogs = DialogCache()
+        return self.dialogs.search(text)
 
     def clean_message_text(self, text):
         """
@@ -261,105 +1774,797 @@ class TelegramForwarder:
         """
         if not text:
             return ""
-        clean_text = text
-        for regex in self.signature_regex:
-            clean_text = regex.sub('', clean_text)
+        if text in self.clean_cache:
+            self.clean_cache.move_to_end(text)
+            return self.clean_cache[text]
+        clean_text = self.signature_regex.sub('', text)
         # Remove any trailing whitespace or excessive newlines.
         clean_text = clean_text.strip()
         if clean_text != text:
-            logger.info("Unwanted signature removed from message")
+            logger.debug("Unwanted signature removed from message")
+        self.clean_cache[text] = clean_text
+        if len(self.clean_cache) > CLEAN_CACHE_SIZE:
+            self.clean_cache.popitem(last=False)
         return clean_text
 
-    async def forward_messages_to_channels(self, source_chat_ids, destination_channel_ids, keywords, signature):
+    def content_key(self, messages):
+        """
+        Hashes the cleaned, whitespace/case-normalized text and the media ids of a
+        message (or album). Returns None if some media file cannot be identified.
+        Media without a file (link previews, polls, locations) counts as text only.
+        """
+        text = ' '.join(self.clean_message_text(message.text) for message in messages)
+        parts = [' '.join(text.lower().split())]
+        for message in messages:
+            if message.media and message.file is not None:
+                media_id = media_unique_id(message)
+                if media_id is None:
+                    return None
+                parts.append(media_id)
+        if not any(parts):
+            return None
+        return hashlib.sha1('\0'.join(parts).encode()).hexdigest()
+
+    def build_final_text(self, text, signature):
+        """
+        Cleans the text and appends the custom signature (if any).
+        """
+        final_text = self.clean_message_text(text) if text else ""
+        if signature:
+            final_text = f"{final_text}\n\n**{signature}**" if final_text else f"**{signature}**"
+        return final_text
+
+    def should_forward(self, messages, profile):
+        """
+        Applies the keyword filter and the blacklist of a profile to a message
+        (or to the combined captions of an album).
+        """
+        return profile.filter.matches("\n".join(message.text for message in messages if message.text))
+
+    def can_copy_natively(self, message, sender):
+        """
+        True if the media of a message can be re-sent server-side by reference,
+        without downloading and uploading the bytes. File references belong to the
+        account that fetched the message, so this needs the reader to be the sender.
+        """
+        return (self.reader is sender
+                and message.file is not None
+                and not getattr(message, 'noforwards', False)
+                and message.chat_id not in self.restricted_chats)
+
+    async def fan_out(self, destination_channel_ids, sends, message=None):
+        """
+        Queues every send for every destination. Sends for the same destination
+        are delivered in order; different destinations proceed independently.
+        Returns the futures of all queued sends.
+        """
+        futures = []
+        for dest_id in destination_channel_ids:
+            for send in sends:
+                future = await self.scheduler.submit(dest_id, send)
+                if message is not None:
+                    future.add_done_callback(lambda _, dest_id=dest_id: tracer.mark(
+                        message.chat_id, message.id, 'send', destination=dest_id))
+                futures.append(future)
+        if message is not None:
+            tracer.mark(message.chat_id, message.id, 'queued')
+        return futures
+
+    async def prepare_media(self, messages, destination_channel_ids):
+        """
+        Uploads media ahead of the sends with every bot that will relay it, so the
+        media stage (not the send queue) pays for the transfer.
+        """
+        senders = {self.senders.client_for(dest_id) for dest_id in destination_channel_ids}
+        senders = [sender for sender in senders
+                   if not all(self.can_copy_natively(message, sender) for message in messages)]
+        if senders:
+            await asyncio.gather(*(self.media_relay.upload_all(message, senders) for message in messages))
+
+    async def send_media(self, sender, dest_id, message, caption_text, attributes):
+        """
+        Re-sends media by reference where possible; otherwise, or if the source
+        protects its content, sends the relayed upload of this bot.
+        """
+        if self.can_copy_natively(message, sender):
+            try:
+                return await sender.send_file(dest_id, message.media, caption=caption_text, attributes=attributes)
+            except ChatForwardsRestrictedError:
+                if message.chat_id not in self.restricted_chats:
+                    logger.info(f"Chat {message.chat_id} restricts forwarding, relaying media instead")
+                    self.restricted_chats.add(message.chat_id)
+        uploaded = await self.media_relay.upload(message, sender)
+        if uploaded is not None:
+            return await sender.send_file(dest_id, uploaded, caption=caption_text, attributes=attributes)
+
+    async def send_album(self, sender, dest_id, messages, captions):
+        """
+        Album counterpart of send_media.
+        """
+        if all(self.can_copy_natively(message, sender) for message in messages):
+            try:
+                return await sender.send_file(dest_id, [message.media for message in messages], caption=captions)
+            except ChatForwardsRestrictedError:
+                chat_id = messages[0].chat_id
+                if chat_id not in self.restricted_chats:
+                    logger.info(f"Chat {chat_id} restricts forwarding, relaying media instead")
+                    self.restricted_chats.add(chat_id)
+        uploaded = list(await asyncio.gather(*(self.media_relay.upload(message, sender) for message in messages)))
+        return await sender.send_file(dest_id, uploaded, caption=captions)
+
+    def build_album_captions(self, messages, signature):
+        """
+        Cleans the caption of every album item. The custom signature is appended
+        once, to the first caption with text (or to the first item).
+        """
+        captions = [self.clean_message_text(message.text) for message in messages]
+        if signature:
+            index = next((i for i, caption in enumerate(captions) if caption), 0)
+            captions[index] = f"{captions[index]}\n\n**{signature}**" if captions[index] else f"**{signature}**"
+        return captions
+
+    def accepts(self, messages, profile):
+        """
+        Applies the filters of a profile and the dedup cache to a message (a list
+        with one item, or all parts of an album). Returns whether it passes and its
+        dedup key, which stays reserved until its delivery settles.
+        """
+        with metrics.timer('soluify_filter_seconds'):
+            matched = self.should_forward(messages, profile)
+        if not matched:
+            metrics.inc('soluify_messages_filtered_total', profile=profile.label)
+            return False, None
+        # The same announcement reposted in several sources is only sent once.
+        key = self.content_key(messages)
+        if self.dedup.seen(profile.label, key):
+            metrics.inc('soluify_messages_deduplicated_total', profile=profile.label)
+            return False, None
+        return True, key
+
+    async def process_message(self, messages, profile):
+        """
+        Cleans an accepted message (a list with one item, or all parts of an album),
+        fetches its media if needed and queues it for every destination chat of a
+        profile. Returns the futures of the queued sends.
+        """
+        if len(messages) > 1:
+            return await self.process_album(messages, profile)
+        message = messages[0]
+        sends = []
+        if message.text:
+            final_text = self.build_final_text(message.text, profile.signature)
+            tracer.mark(message.chat_id, message.id, 'clean')
+            sends.append(lambda dest_id: self.senders.send_via(
+                dest_id, lambda sender: sender.send_message(dest_id, final_text)))
+        if message.media and message.file is not None:
+            caption_text = self.build_final_text(message.text, profile.signature)
+            attributes = media_attributes(message)
+            await self.prepare_media(messages, profile.destination_channel_ids)
+            sends.append(lambda dest_id: self.senders.send_via(
+                dest_id, lambda sender: self.send_media(sender, dest_id, message, caption_text, attributes)))
+        return await self.fan_out(profile.destination_channel_ids, sends, message)
+
+    async def process_album(self, messages, profile):
+        """
+        Sends all parts of an album as a single grouped send per destination.
+        """
+        messages = [message for message in messages if message.file is not None]
+        if not messages:
+            return []
+        captions = self.build_album_captions(messages, profile.signature)
+        tracer.mark(messages[0].chat_id, messages[0].id, 'clean')
+        await self.prepare_media(messages, profile.destination_channel_ids)
+        send = lambda dest_id: self.senders.send_via(
+            dest_id, lambda sender: self.send_album(sender, dest_id, messages, captions))
+        return await self.fan_out(profile.destination_channel_ids, [send], messages[0])
+
+    def track_delivery(self, profile, chat_id, first_id, key=None):
+        """
+        Registers a message of a source (first_id is its lowest id, key its reserved
+        dedup key) on its way to the media stage. Returns the future that deliver
+        resolves with the results of its sends (None if nothing was sent); the
+        checkpoint of the source stays below the message until then.
+        """
+        done = asyncio.get_event_loop().create_future()
+        profile.deliveries[chat_id].append((first_id, done, key))
+        done.add_done_callback(lambda _: self.settle_deliveries(profile, chat_id))
+        return done
+
+    def settle_deliveries(self, profile, chat_id):
+        """
+        Drops the finished deliveries of a source and moves its checkpoint to the
+        position of the profile, but below the oldest message still being sent.
+        """
+        pending = profile.deliveries[chat_id]
+        finished = [entry for entry in pending if entry[1].done()]
+        for entry in finished:
+            pending.remove(entry)
+        if profile.name:
+            position = profile.last_message_ids.get(chat_id, 0)
+            if pending:
+                position = min(position, min(first_id for first_id, _, _ in pending) - 1)
+            self.checkpoints.update(profile.name, chat_id, position)
+        for _, done, key in finished:
+            results = (None if done.cancelled() else done.result()) or []
+            failed = [result for result in results if isinstance(result, Exception)]
+            # A message that reached at least one destination counts as sent for dedup.
+            if len(failed) < len(results):
+                self.dedup.confirm(profile.label, key)
+            else:
+                self.dedup.release(profile.label, key)
+            if results and not failed:
+                metrics.inc('soluify_messages_forwarded_total', profile=profile.label)
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                console.status(f"[{timestamp}] [{profile.label}] Message forwarded!", SUCCESS_COLOR, SUCCESS_COLOR, "✅",
+                               key=('forwarded', profile.label))
+
+    def advance(self, profile, chat_id, message_id):
+        """
+        Moves the position of a profile in a source chat forward and records it
+        as a checkpoint (named profiles only).
+        """
+        profile.last_message_ids[chat_id] = max(profile.last_message_ids.get(chat_id, 0), message_id)
+        profile.seen_ids[chat_id] = {seen for seen in profile.seen_ids[chat_id] if seen > message_id}
+        if profile.name:
+            self.checkpoints.update(profile.name, chat_id, profile.last_message_ids[chat_id])
+
+    def mark_dispatched(self, profile, chat_id, message_ids, polled):
+        """
+        Records dispatched messages. A poll reads a chat in order from the position,
+        so it moves the position up to its message. A pushed message may arrive
+        ahead of missed ones: it is only remembered, and the position catches up
+        once the ids in between were seen (channels number posts one by one) or
+        the next gap fill read them.
+        """
+        position = profile.last_message_ids.get(chat_id, 0)
+        seen = profile.seen_ids[chat_id]
+        if polled:
+            position = max(position, *message_ids)
+        else:
+            seen.update(message_id for message_id in message_ids if message_id > position)
+        while position + 1 in seen:
+            position += 1
+        profile.last_message_ids[chat_id] = position
+        if any(message_id <= position for message_id in seen):
+            profile.seen_ids[chat_id] = {message_id for message_id in seen if message_id > position}
+
+    def read_position(self, chat_id):
+        """
+        Returns the lowest position among the running profiles reading a source
+        chat (so a shared source is read only once), or None if nobody needs it.
+        """
+        positions = [profile.last_message_ids.get(chat_id, 0)
+                     for profile in self.routes.get(chat_id, ()) if profile.running]
+        return min(positions) if positions else None
+
+    def start_pipeline(self):
+        self.filter_queues = [asyncio.Queue(maxsize=STAGE_QUEUE_SIZE) for _ in range(self.filter_workers)]
+        self.media_queues = [asyncio.Queue(maxsize=STAGE_QUEUE_SIZE) for _ in range(self.media_workers)]
+        self.stage_tasks = ([asyncio.ensure_future(self.run_stage(queue, self.dispatch)) for queue in self.filter_queues]
+                            + [asyncio.ensure_future(self.run_stage(queue, self.deliver)) for queue in self.media_queues])
+
+    async def unless_forced(self, awaitable):
+        """
+        Awaits something, but gives up as soon as force_stop is set.
+        """
+        waiter = asyncio.ensure_future(awaitable)
+        forced = asyncio.ensure_future(self.force_stop.wait())
+        await asyncio.wait((waiter, forced), return_when=asyncio.FIRST_COMPLETED)
+        for task in (waiter, forced):
+            task.cancel()
+        await asyncio.gather(waiter, forced, return_exceptions=True)
+
+    async def stop_pipeline(self):
+        """
+        Lets every stage finish its queued items (in stage order), then stops the
+        workers. After force_stop, queued items are abandoned.
+        """
+        for queues in (self.filter_queues, self.media_queues):
+            await self.unless_forced(asyncio.gather(*(queue.join() for queue in queues)))
+        for task in self.stage_tasks:
+            task.cancel()
+        await asyncio.gather(*self.stage_tasks, return_exceptions=True)
+        self.stage_tasks = []
+
+    async def run_stage(self, queue, handle):
+        while True:
+            item = await queue.get()
+            try:
+                await self.run_guarded(handle(*item))
+            finally:
+                queue.task_done()
+
+    async def ingest(self, chat_id, messages, polled=False):
+        """
+        Queues a message (or the parts of an album) from a source chat for filtering.
+        Waits while the filter worker of that chat is full, so a slow stage further
+        down slows reading instead of piling up messages in memory. polled marks
+        messages read in order by poll_sources (see mark_dispatched).
+        """
+        tracer.start(chat_id, messages[0].id, getattr(messages[0], 'date', None))
+        await self.filter_queues[hash(chat_id) % len(self.filter_queues)].put((chat_id, messages, polled))
+
+    async def dispatch(self, chat_id, messages, polled):
+        """
+        Filter stage: hands a message from a source chat to every running profile
+        that has not forwarded it yet, and queues it for the media stage.
+        """
+        posted = getattr(messages[0], 'date', None)
+        if posted is not None:
+            metrics.observe('soluify_ingest_delay_seconds', max(0.0, time.time() - posted.timestamp()))
+        media_queue = self.media_queues[hash(chat_id) % len(self.media_queues)]
+        queued = False
+        for profile in list(self.routes.get(chat_id, ())):
+            if not profile.running:
+                continue
+            last_id = profile.last_message_ids.get(chat_id, 0)
+            seen = profile.seen_ids[chat_id]
+            unseen = [message for message in messages if message.id > last_id and message.id not in seen]
+            self.mark_dispatched(profile, chat_id, [message.id for message in messages], polled)
+            if unseen:
+                accepted, key = self.accepts(unseen, profile)
+                tracer.mark(chat_id, messages[0].id, 'filter', profile=profile.label, accepted=accepted)
+                if accepted:
+                    tracer.hold(chat_id, messages[0].id)
+                    queued = True
+                # Filtered messages pass through too, so checkpoints advance in order.
+                delivery = self.track_delivery(profile, chat_id, unseen[0].id, key)
+                await media_queue.put((profile, chat_id, delivery, unseen if accepted else None))
+        if not queued:
+            tracer.finish(chat_id, messages[0].id)
+
+    async def deliver(self, profile, chat_id, delivery, messages):
+        """
+        Media stage: fetches media and queues the sends of an accepted message.
+        A failed attempt is retried up to MAX_RETRIES times, then the message is
+        dropped with an error; the checkpoint only moves past it after that.
+        """
+        if not messages:
+            delivery.set_result(None)
+            return
+        tracer.mark(chat_id, messages[0].id, 'media')
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                futures = await self.process_message(messages, profile)
+                break
+            except FloodWaitError as e:
+                error, delay = e, e.seconds
+            except Exception as e:
+                error, delay = e, RETRY_DELAY
+            logger.error(f"[{profile.label}] Preparing message {messages[0].id} from {chat_id} failed "
+                         f"(attempt {attempt}/{MAX_RETRIES}): {error}")
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(delay)
+        else:
+            metrics.inc('soluify_messages_dropped_total', profile=profile.label)
+            logger.error(f"[{profile.label}] Dropping message {messages[0].id} from {chat_id} "
+                         f"after {MAX_RETRIES} attempts: {error}")
+            console.status(f"[{profile.label}] Dropped message {messages[0].id} from {chat_id}: {error}",
+                           ALERT_COLOR, ALERT_COLOR, key=('dropped', profile.label))
+            tracer.release(chat_id, messages[0].id)
+            delivery.set_result(None)
+            return
+        # The trace of a message ends once the sends of every profile are done.
+        done = asyncio.gather(*futures, return_exceptions=True)
+        done.add_done_callback(lambda _: tracer.release(chat_id, messages[0].id))
+        done.add_done_callback(lambda _: delivery.set_result(None if done.cancelled() else done.result()))
+
+    async def catch_up_start(self, chat_id, min_id, limit):
+        """
+        Returns the id to read from so that at most `limit` messages newer than
+        min_id are fetched (the newest ones), using a single request.
+        """
+        older = await self.reader.get_messages(chat_id, min_id=min_id, limit=1, add_offset=limit)
+        return max(min_id, older[0].id) if older else min_id
+
+    async def poll_sources(self, limit=None):
+        """
+        Streams everything newer than the last forwarded id of each source chat
+        (at most `limit` newest messages) in chronological order, page by page,
+        into the pipeline. Consecutive parts of an album are queued together.
+        """
+        with metrics.timer('soluify_poll_seconds'):
+            await self.poll_each_source(limit)
+
+    async def poll_each_source(self, limit):
+        for chat_id in list(self.routes):
+            min_id = self.read_position(chat_id)
+            if min_id is None:
+                continue
+            if limit:
+                min_id = await self.catch_up_start(chat_id, min_id, limit)
+            album = []
+            async for message in self.reader.iter_messages(chat_id, min_id=min_id, reverse=True):
+                if self.force_stop.is_set():
+                    return
+                if album and message.grouped_id != album[0].grouped_id:
+                    await self.ingest(chat_id, album, polled=True)
+                    album = []
+                if message.grouped_id:
+                    album.append(message)
+                else:
+                    await self.ingest(chat_id, [message], polled=True)
+            if album:
+                await self.ingest(chat_id, album, polled=True)
+
+    async def run_guarded(self, coro):
+        """
+        Awaits a forwarding step and reports Telegram errors without stopping the loop.
+        """
+        try:
+            await coro
+        except FloodWaitError as e:
+            metrics.inc('soluify_flood_wait_seconds_total', e.seconds, scope='read')
+            logger.error(f"Flood wait error: {e}. Waiting {e.seconds} seconds.")
+            console.status(f"Flood wait error: {e}. Pausing for {e.seconds} seconds...", ALERT_COLOR, ALERT_COLOR)
+            await asyncio.sleep(e.seconds)
+        except RPCError as e:
+            logger.error(f"RPC error: {e}")
+            console.status(f"RPC error: {e}. Check your connection and try again.", ALERT_COLOR, ALERT_COLOR, key='rpc_error')
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            console.status(f"Unexpected error: {e}", ALERT_COLOR, ALERT_COLOR, key='unexpected_error')
+
+    async def add_profile(self, profile):
+        """
+        Registers a profile with the running forwarder. Each source starts from the
+        stored checkpoint (named profiles) or from the newest message, unless the
+        profile already has a position there (a reloaded profile).
+        """
+        for chat_id in profile.source_chat_ids:
+            if chat_id not in profile.last_message_ids:
+                checkpoint = self.checkpoints.get(profile.name, chat_id) if profile.name else None
+                if checkpoint is not None:
+                    profile.last_message_ids[chat_id] = checkpoint
+                else:
+                    msgs = await self.reader.get_messages(chat_id, limit=1)
+                    self.advance(profile, chat_id, msgs[0].id if msgs else 0)
+        for chat_id in profile.source_chat_ids:
+            self.routes[chat_id].append(profile)
+        self.profiles[profile.label] = profile
+        self.gap_fill_requested = True
+
+    def remove_profile(self, label):
+        profile = self.profiles.pop(label, None)
+        if profile is None:
+            return
+        profile.running = False
+        for chat_id in profile.source_chat_ids:
+            self.routes[chat_id].remove(profile)
+            if not self.routes[chat_id]:
+                del self.routes[chat_id]
+
+    def stop_profile(self, label):
+        """
+        Pauses a profile. Its checkpoints stay where they are.
+        """
+        if label in self.profiles:
+            self.profiles[label].running = False
+            return True
+        return False
+
+    def start_profile(self, label):
+        """
+        Resumes a paused profile; the next gap fill catches up on what it missed.
+        """
+        if label in self.profiles:
+            self.profiles[label].running = True
+            self.gap_fill_requested = True
+            return True
+        return False
+
+    async def unreadable_sources(self, profiles):
+        """
+        Returns {chat_id: error} for the source chats of profiles that the reader
+        cannot read (unknown, private or left chats).
+        """
+        errors = {}
+        for chat_id in sorted({chat_id for profile in profiles for chat_id in profile.source_chat_ids}):
+            try:
+                await self.reader.get_messages(chat_id, limit=1)
+            except FloodWaitError:
+                # Rate limited, but the chat is there.
+                continue
+            except (ValueError, RPCError) as e:
+                errors[chat_id] = e
+        return errors
+
+    def owns(self, chat_id):
+        return self.shard is None or ReaderPool.ring_hash(chat_id) % self.shard[1] == self.shard[0]
+
+    def build_profile(self, name, config):
+        """
+        Creates a saved profile limited to the source chats of this shard, or
+        returns None if the shard has none of them.
+        """
+        sources = [chat_id for chat_id in config['source_chat_ids'] if self.owns(chat_id)]
+        if not sources:
+            return None
+        profile = ForwardingProfile.from_config(name, dict(config, source_chat_ids=sources))
+        profile.config = config
+        return profile
+
+    def watch_profiles(self, store, names=None):
+        """
+        Follows edits of the saved profiles in store during the next run_profiles
+        call. names limits it to those profiles; None follows every saved profile,
+        including new ones.
+        """
+        self.profile_store = store
+        self.watched_profiles = set(names) if names is not None else None
+        self.profile_version = store.version
+
+    async def reload_profiles(self):
+        """
+        Applies changes of the profiles file to the running profiles: edited ones
+        are replaced (keeping their position and queued deliveries), deleted ones
+        are removed and, when following every profile, new ones are started.
+        """
+        if self.profile_store is None or time.monotonic() - self.last_profile_check < PROFILE_RELOAD_INTERVAL:
+            return
+        self.last_profile_check = time.monotonic()
+        try:
+            configs = self.profile_store.load()
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reloading profiles: {e}")
+            return
+        if self.profile_store.version == self.profile_version:
+            return
+        self.profile_version = self.profile_store.version
+        watched = self.watched_profiles
+        names = set(configs) if watched is None else watched
+        for label, profile in list(self.profiles.items()):
+            if profile.name and profile.name not in configs and (watched is None or profile.name in watched):
+                self.remove_profile(label)
+                console.status(f"Profile '{label}' deleted, stopped forwarding it.", ALERT_COLOR, ALERT_COLOR)
+        for name in sorted(names & set(configs)):
+            old = self.profiles.get(name)
+            if old is not None and old.config == configs[name]:
+                continue
+            try:
+                profile = self.build_profile(name, configs[name])
+            except (KeyError, TypeError) as e:
+                logger.error(f"Invalid profile '{name}': {e}")
+                continue
+            if profile is None:
+                # None of its sources belong to this shard (any more).
+                self.remove_profile(name)
+                continue
+            if old is not None:
+                profile.running = old.running
+                profile.last_message_ids = {chat_id: last_id for chat_id, last_id in old.last_message_ids.items()
+                                            if chat_id in profile.source_chat_ids}
+                profile.seen_ids = old.seen_ids
+                # Sends still queued for the old version settle the same checkpoints in order.
+                profile.deliveries = old.deliveries
+                self.remove_profile(name)
+            await self.run_guarded(self.add_profile(profile))
+            if name not in self.profiles:
+                # Retried on the next check.
+                self.profile_version = None
+                continue
+            state = "reloaded" if old is not None else "added"
+            console.status(f"Profile '{name}' {state}.", SUCCESS_COLOR, SUCCESS_COLOR, "🔁")
+
+    def start_exit_listener(self):
+        # Start the exit listener in a background thread.
+        thread = threading.Thread(target=exit_listener, args=(self,))
+        thread.daemon = True
+        thread.start()
+
+    async def forward_messages_to_channels(self, source_chat_ids, destination_channel_ids, keywords, signature,
+                                           profile_name=None, interactive=True):
         """
         Forwards messages from source chats (fetched by the user account)
         to destination chats (sent by the bot). Unwanted signature patterns are removed
         before sending. If a custom signature is provided (non-empty), it is appended.
+        For a named profile, forwarding resumes from the stored checkpoints, catching
+        up on at most max_catchup messages per source that arrived while offline.
+        With interactive=False no console listener is started; set running to False to stop.
+        """
+        profile = ForwardingProfile(profile_name, source_chat_ids, destination_channel_ids,
+                                    keywords, signature, self.blacklist)
+        if interactive:
+            await self.forward_profiles([profile])
+        else:
+            await self.run_profiles([profile])
+
+    async def forward_profiles(self, profiles):
+        """
+        Interactive variant of run_profiles: also listens for console commands.
+        """
+        self.running = True
+        self.start_exit_listener()
+        await self.run_profiles(profiles)
+
+    async def run_profiles(self, profiles):
+        """
+        Runs several profiles concurrently over the shared reader/sender clients.
+        Sources used by more than one profile are read only once.
         """
         if not await self.ensure_connections():
             return
         self.running = True
-        # Start the exit listener in a background thread.
-        thread = threading.Thread(target=exit_listener, args=(self,))
-        thread.daemon = True
-        thread.start()
-        # Initialize last_message_ids for each source chat.
-        last_message_ids = {}
-        for chat_id in source_chat_ids:
-            msgs = await self.reader.get_messages(chat_id, limit=1)
-            last_message_ids[chat_id] = msgs[0].id if msgs else 0
+        self.force_stop.clear()
+        for profile in profiles:
+            await self.add_profile(profile)
+        self.start_pipeline()
+        self.supervisor = ConnectionSupervisor(self.supervised_clients(), self.connection_restored)
+        self.supervisor.start()
+        metrics_server = await self.metrics.serve(self.metrics_port) if self.metrics_port else None
+        summary_task = (asyncio.ensure_future(self.metrics.report_periodically(METRICS_SUMMARY_INTERVAL))
+                        if METRICS_SUMMARY_INTERVAL else None)
+        try:
+            await self.run_guarded(self.poll_sources(limit=self.max_catchup))
+            self.gap_fill_requested = False
+            if self.ingest_mode == 'push':
+                await self.run_push_loop()
+            else:
+                await self.run_poll_loop()
+        finally:
+            # Let queued messages and sends finish so their checkpoints can be recorded;
+            # the supervisor keeps reconnecting meanwhile. After force_stop the rest is
+            # abandoned; the checkpoints already stay below the unsent messages.
+            await self.stop_pipeline()
+            await self.unless_forced(self.scheduler.drain())
+            if self.force_stop.is_set():
+                await self.scheduler.close()
+            self.checkpoints.flush()
+            self.dedup.flush()
+            await self.supervisor.stop()
+            # Profiles added by reloads go too, and the next run follows only what it asks for.
+            for label in list(self.profiles):
+                self.remove_profile(label)
+            self.profile_store = None
+            self.watched_profiles = None
+            if summary_task:
+                summary_task.cancel()
+            if metrics_server:
+                metrics_server.close()
+                await metrics_server.wait_closed()
+
+    async def run_poll_loop(self):
+        """
+        Legacy ingestion: polls every source chat every POLL_INTERVAL seconds.
+        """
         while self.running:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(gradient_text(f"[{timestamp}] Checking for new messages...", MAIN_COLOR_START, MAIN_COLOR_END, "👀"))
-            try:
-                for chat_id in source_chat_ids:
-                    messages = await self.reader.get_messages(chat_id, min_id=last_message_ids[chat_id], limit=None)
-                    for message in reversed(messages):
-                        should_forward = False
-                        if keywords:
-                            if message.text and any(keyword.lower() in message.text.lower() for keyword in keywords):
-                                should_forward = True
-                        else:
-                            should_forward = True
-                        if message.text and any(bad.lower() in message.text.lower() for bad in self.blacklist):
-                            should_forward = False
-                        if should_forward:
-                            if message.text:
-                                clean_text = self.clean_message_text(message.text)
-                                final_text = clean_text
-                                if signature:  # Optionally append a custom signature if provided
-                                    final_text += f"\n\n**{signature}**"
-                                for dest_id in destination_channel_ids:
-                                    await self.sender.send_message(dest_id, final_text)
-                            if message.media:
-                                media_path = await self.reader.download_media(message.media)
-                                caption_text = ""
-                                if message.text:
-                                    clean_text = self.clean_message_text(message.text)
-                                    caption_text = clean_text
-                                    if signature:
-                                        caption_text += f"\n\n**{signature}**"
-                                else:
-                                    if signature:
-                                        caption_text = f"**{signature}**"
-                                for dest_id in destination_channel_ids:
-                                    await self.sender.send_file(dest_id, media_path, caption=caption_text)
-                            print(gradient_text(f"[{timestamp}] Message forwarded!", SUCCESS_COLOR, SUCCESS_COLOR, "✅"))
-                            last_message_ids[chat_id] = max(last_message_ids[chat_id], message.id)
-            except FloodWaitError as e:
-                logger.error(f"Flood wait error: {e}. Waiting {e.seconds} seconds.")
-                print(gradient_text(f"Flood wait error: {e}. Pausing for {e.seconds} seconds...", ALERT_COLOR, ALERT_COLOR))
-                await asyncio.sleep(e.seconds)
-            except RPCError as e:
-                logger.error(f"RPC error: {e}")
-                print(gradient_text(f"RPC error: {e}. Check your connection and try again.", ALERT_COLOR, ALERT_COLOR))
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-                print(gradient_text(f"Unexpected error: {e}", ALERT_COLOR, ALERT_COLOR))
-            await asyncio.sleep(5)
+            console.status(f"[{timestamp}] Checking for new messages...", MAIN_COLOR_START, MAIN_COLOR_END, "👀")
+            self.gap_fill_requested = False
+            # While the reader is offline the supervisor reconnects it; skip the cycle.
+            if self.reader.is_connected():
+                await self.run_guarded(self.poll_sources())
+            self.checkpoints.flush()
+            self.dedup.flush()
+            await asyncio.sleep(POLL_INTERVAL)
+            await self.reload_profiles()
+
+    async def run_push_loop(self):
+        """
+        Real-time ingestion: the reader client pushes new messages from the source
+        chats into the pipeline. Polling is only used to fill gaps after a reconnect
+        (see ConnectionSupervisor) and as a slow safety net every GAP_FILL_INTERVAL seconds.
+        """
+        async def on_new_message(event):
+            await self.ingest(event.chat_id, [event.message])
+
+        async def on_album(event):
+            await self.ingest(event.chat_id, event.messages)
+
+        # Filtering on the live route table lets profiles be added or removed
+        # without re-registering the handlers. Album parts arrive via events.Album.
+        self.reader.add_event_handler(on_new_message, events.NewMessage(
+            func=lambda e: e.chat_id in self.routes and not e.message.grouped_id))
+        self.reader.add_event_handler(on_album, events.Album(func=lambda e: e.chat_id in self.routes))
+        # Pick up anything posted between the initial catch-up and the handlers.
+        self.gap_fill_requested = True
+        console.status("Listening for new messages in real time...", MAIN_COLOR_START, MAIN_COLOR_END, "👂")
+        last_gap_fill = time.monotonic()
+        try:
+            while self.running:
+                await asyncio.sleep(1)
+                self.checkpoints.maybe_flush()
+                self.dedup.maybe_flush()
+                await self.reload_profiles()
+                # While the reader is offline the gap fill waits for the supervisor.
+                if self.reader.is_connected() and (self.gap_fill_requested
+                                                   or time.monotonic() - last_gap_fill >= GAP_FILL_INTERVAL):
+                    self.gap_fill_requested = False
+                    await self.run_guarded(self.poll_sources())
+                    last_gap_fill = time.monotonic()
+        finally:
+            self.reader.remove_event_handler(on_new_message)
+            self.reader.remove_event_handler(on_album)
 
 # ------------------------------------------------------------------------------
 # Profile management (load/save/edit)
 # ------------------------------------------------------------------------------
+class ProfileStore:
+    """
+    Saved profiles (CONFIG_FILE) cached in memory, with an index of the profiles
+    reading each source chat. The file is only parsed again when it changed on
+    disk, and saves replace it atomically, so an interrupted write leaves the
+    previous version intact.
+    """
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.profiles = {}
+        self.by_source = {}
+        self.stamp = None
+        # Bumped whenever the cached profiles change (see TelegramForwarder.reload_profiles).
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load(self):
+        """
+        Returns the saved profiles by name. The configs are shared with the cache,
+        so copy one before changing it.
+        """
+        with self.lock:
+            stamp = self.file_stamp()
+            if stamp != self.stamp:
+                profiles = {}
+                if stamp is not None:
+                    with open(self.path, 'r') as file:
+                        profiles = json.load(file)
+                self.index(profiles, stamp)
+            return dict(self.profiles)
+
+    def index(self, profiles, stamp):
+        by_source = defaultdict(list)
+        for name, config in profiles.items():
+            for chat_id in config.get('source_chat_ids', ()):
+                by_source[chat_id].append(name)
+        self.profiles = profiles
+        self.by_source = dict(by_source)
+        self.stamp = stamp
+        self.version += 1
+
+    def profiles_for_source(self, chat_id):
+        """
+        Names of the saved profiles that read a source chat.
+        """
+        with self.lock:
+            self.load()
+            return list(self.by_source.get(chat_id, ()))
+
+    def save(self, name, config):
+        with self.lock:
+            profiles = self.load()
+            profiles[name] = config
+            self.write(profiles)
+
+    def delete(self, name):
+        with self.lock:
+            profiles = self.load()
+            if profiles.pop(name, None) is not None:
+                self.write(profiles)
+
+    def write(self, profiles):
+        write_atomic(self.path, json.dumps(profiles, indent=4).encode())
+        self.index(profiles, self.file_stamp())
+
+profile_store = ProfileStore()
+
 def load_profiles():
-    try:
-        with open(CONFIG_FILE, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
+    return profile_store.load()
 
 def save_profile(profile_name, config):
-    profiles = load_profiles()
-    profiles[profile_name] = config
-    with open(CONFIG_FILE, 'w') as file:
-        json.dump(profiles, file, indent=4)
+    profile_store.save(profile_name, config)
 
 def edit_profile(profile_name):
     profiles = load_profiles()
     if profile_name not in profiles:
         print(gradient_text(f"Profile '{profile_name}' not found.", ALERT_COLOR, ALERT_COLOR))
         return
-    config = profiles[profile_name]
+    config = dict(profiles[profile_name])
     print(gradient_text(f"Editing profile: {profile_name}", MAIN_COLOR_START, MAIN_COLOR_END))
     config['source_chat_ids'] = input(gradient_text("Source chat IDs (comma separated): ", PROMPT_COLOR_START, PROMPT_COLOR_END)).split(',')
     config['source_chat_ids'] = [int(chat_id.strip()) for chat_id in config['source_chat_ids']]
@@ -370,7 +2575,6 @@ def edit_profile(profile_name):
     config['signature'] = input(gradient_text("Signature to append under each message (leave empty to append nothing): ", PROMPT_COLOR_START, PROMPT_COLOR_END))
     config['blacklist'] = input(gradient_text("Blacklisted words (comma separated, or leave empty): ", PROMPT_COLOR_START, PROMPT_COLOR_END)).split(',')
     config['blacklist'] = [w.strip().lower() for w in config['blacklist'] if w.strip()]
-    profiles[profile_name] = config
     save_profile(profile_name, config)
     print(gradient_text(f"Profile '{profile_name}' updated!", SUCCESS_COLOR, SUCCESS_COLOR, "✅"))
 
@@ -389,6 +2593,8 @@ async def graceful_shutdown(credentials_saved):
         if not credentials_saved:
             try:
                 os.remove(CREDENTIALS_FILE)
+                if os.path.exists(KEY_FILE):
+                    os.remove(KEY_FILE)
                 os.remove('session_bot.session')
                 os.remove('session_user.session')
                 print(gradient_text("Credentials and session files removed.", SUCCESS_COLOR, SUCCESS_COLOR, "✅"))
@@ -414,6 +2620,10 @@ async def display_help():
        - Unwanted signature patterns (e.g. YouTube, Telegram, Twitter, DAPP links)
          are automatically removed.
        - Optionally, a custom signature can be appended.
+       - New messages are picked up in real time; a slow background poll
+         fills any gaps left by connection drops.
+       - Several saved profiles (or 'all') can run at once. While running,
+         type 'stop <profile>', 'start <profile>', 'status' or 'exit'.
     
     3. Edit Profile:
        - Modify existing configuration profiles.
@@ -435,6 +2645,7 @@ async def display_help():
 # Fancy matrix animation for startup
 # ------------------------------------------------------------------------------
 async def matrix_effect(logo_frames):
+    from tqdm.asyncio import tqdm as atqdm
     logo_width = max(len(line) for line in logo_frames)
     logo_height = len(logo_frames)
     matrix = [[' ' for _ in range(logo_width)] for _ in range(logo_height)]
@@ -479,6 +2690,7 @@ def get_new_config():
     blacklist = input(gradient_text("Blacklisted words (comma separated, or empty): ", PROMPT_COLOR_START, PROMPT_COLOR_END)).split(',')
     blacklist = [w.strip().lower() for w in blacklist if w.strip()]
     save_choice = input(gradient_text("Save this config as a profile? (y/n): ", PROMPT_COLOR_START, PROMPT_COLOR_END))
+    profile_name = None
     if save_choice.lower() == 'y':
         profile_name = input(gradient_text("Name for this profile: ", PROMPT_COLOR_START, PROMPT_COLOR_END))
         save_profile(profile_name, {
@@ -488,7 +2700,7 @@ def get_new_config():
             'signature': signature,
             'blacklist': blacklist
         })
-    return source_chat_ids, destination_channel_ids, keywords, signature, blacklist
+    return source_chat_ids, destination_channel_ids, keywords, signature, blacklist, profile_name
 
 # ------------------------------------------------------------------------------
 # MAIN
@@ -540,6 +2752,15 @@ Welcome to the Soluify Telegram Copy & Paste Bot (Hybrid Version)!
         user_api_id, user_api_hash, phone_number = get_user_credentials()
         reader_client = TelegramClient('session_user', int(user_api_id), user_api_hash)
         await reader_client.start(phone=phone_number)
+        # More accounts (same API ID/hash) spread the reading of many sources.
+        readers = [reader_client]
+        while input(gradient_text("Add another USER account for reading? (y/n): ", PROMPT_COLOR_START, PROMPT_COLOR_END)).strip().lower() == 'y':
+            phone_number = input(gradient_text("Enter its phone number (e.g. +123456789): ", PROMPT_COLOR_START, PROMPT_COLOR_END))
+            client = TelegramClient(f'session_user_{len(readers) + 1}', int(user_api_id), user_api_hash)
+            await client.start(phone=phone_number)
+            readers.append(client)
+        if len(readers) > 1:
+            reader_client = ReaderPool(readers)
     else:
         reader_client = sender_client
     # Initialize the forwarder with both clients
@@ -556,6 +2777,15 @@ Welcome to the Soluify Telegram Copy & Paste Bot (Hybrid Version)!
             if choice == "1":
                 await animated_transition("Fetching chats...")
                 await forwarder.list_chats()
+                while True:
+                    query = input(gradient_text("Search chats by title (leave empty to go back): ", PROMPT_COLOR_START, PROMPT_COLOR_END)).strip()
+                    if not query:
+                        break
+                    matches = forwarder.search_chats(query)
+                    for chat_id, title, chat_type, _ in matches:
+                        print(gradient_text(f"Chat ID: {chat_id}, Title: {title} ({chat_type})", MAIN_COLOR_START, MAIN_COLOR_END))
+                    if not matches:
+                        print(gradient_text("No chats found.", ALERT_COLOR, ALERT_COLOR))
             elif choice == "2":
                 profiles = load_profiles()
                 if profiles:
@@ -564,27 +2794,27 @@ Welcome to the Soluify Telegram Copy & Paste Bot (Hybrid Version)!
                         print(gradient_text("Available profiles:", MAIN_COLOR_START, MAIN_COLOR_END, "🎭"))
                         for idx, profile_name in enumerate(profiles):
                             print(gradient_text(f"{idx + 1}. {profile_name}", MAIN_COLOR_START, MAIN_COLOR_END))
-                        profile_idx = int(input(gradient_text("Select profile number: ", PROMPT_COLOR_START, PROMPT_COLOR_END))) - 1
-                        profile_name = list(profiles.keys())[profile_idx]
-                        config = profiles[profile_name]
-                        forwarder.blacklist = config.get('blacklist', [])
+                        selection = input(gradient_text("Select profile number(s) (comma separated, or 'all'): ", PROMPT_COLOR_START, PROMPT_COLOR_END)).strip().lower()
+                        if selection == 'all':
+                            profile_names = list(profiles.keys())
+                        else:
+                            profile_names = [list(profiles.keys())[int(idx.strip()) - 1] for idx in selection.split(',')]
+                        selected = [ForwardingProfile.from_config(name, profiles[name]) for name in profile_names]
+                        # Edits saved from another window apply without a restart.
+                        forwarder.watch_profiles(profile_store, profile_names)
+                        print(gradient_text("Type 'stop <profile>' or 'start <profile>' to pause/resume a profile, 'status' to list them, 'exit' to stop.", MAIN_COLOR_START, MAIN_COLOR_END))
                         await animated_transition("Message forwarding started...")
-                        await forwarder.forward_messages_to_channels(
-                            source_chat_ids=config['source_chat_ids'],
-                            destination_channel_ids=config['destination_channel_ids'],
-                            keywords=config['keywords'],
-                            signature=config['signature']
-                        )
+                        await forwarder.forward_profiles(selected)
                     else:
-                        s_ids, d_ids, kws, sig, blist = get_new_config()
+                        s_ids, d_ids, kws, sig, blist, name = get_new_config()
                         forwarder.blacklist = blist
                         await animated_transition("Message forwarding started...")
-                        await forwarder.forward_messages_to_channels(s_ids, d_ids, kws, sig)
+                        await forwarder.forward_messages_to_channels(s_ids, d_ids, kws, sig, profile_name=name)
                 else:
-                    s_ids, d_ids, kws, sig, blist = get_new_config()
+                    s_ids, d_ids, kws, sig, blist, name = get_new_config()
                     forwarder.blacklist = blist
                     await animated_transition("Message forwarding started...")
-                    await forwarder.forward_messages_to_channels(s_ids, d_ids, kws, sig)
+                    await forwarder.forward_messages_to_channels(s_ids, d_ids, kws, sig, profile_name=name)
             elif choice == "3":
                 profiles = load_profiles()
                 if profiles:
@@ -608,9 +2838,455 @@ Welcome to the Soluify Telegram Copy & Paste Bot (Hybrid Version)!
             print(gradient_text(f"Unexpected error: {e}. Retrying after a short pause...", ALERT_COLOR, ALERT_COLOR))
             await asyncio.sleep(5)
 
+# ------------------------------------------------------------------------------
+# Headless daemon mode (no animation, no prompts, stops on SIGTERM/SIGINT)
+# ------------------------------------------------------------------------------
+DAEMON_CREDENTIAL_KEYS = ('api_id', 'api_hash', 'bot_token', 'extra_bot_tokens', 'user_api_id', 'user_api_hash')
+
+def load_daemon_credentials(key_file=None):
+    """
+    Collects credentials from a plain JSON key file and/or SOLUIFY_* environment
+    variables (the environment wins). Falls back to the encrypted credentials
+    file, unlocked with a remembered key or SOLUIFY_PASSWORD.
+    """
+    credentials = {}
+    if key_file:
+        with open(key_file, 'r') as f:
+            credentials.update({k: v for k, v in json.load(f).items() if k in DAEMON_CREDENTIAL_KEYS})
+    for key in DAEMON_CREDENTIAL_KEYS:
+        value = os.environ.get(ENV_PREFIX + key.upper())
+        if value:
+            credentials[key] = value
+    if not credentials.get('bot_token') and os.path.exists(CREDENTIALS_FILE):
+        with open(CREDENTIALS_FILE, 'rb') as f:
+            encrypted_data = f.read()
+        key = remembered_key(encrypted_data)
+        password = os.environ.get(ENV_PREFIX + 'PASSWORD')
+        if key is not None or password:
+            credentials.update(decrypt_data(encrypted_data, password, key))
+    # More bots for the sender pool: a list in the key file, comma separated in the environment.
+    extra = credentials.get('extra_bot_tokens') or []
+    if isinstance(extra, str):
+        extra = [token.strip() for token in extra.split(',') if token.strip()]
+    credentials['extra_bot_tokens'] = extra
+    return credentials
+
+def install_signal_handlers(forwarder):
+    # Clearing the running flag lets the ingest loop exit and the queued sends drain.
+    # A second signal sets force_stop, which abandons the drain.
+    loop = asyncio.get_event_loop()
+    stopping = []
+
+    def request_stop(*_):
+        if stopping:
+            logger.error("Second shutdown request, stopping without waiting for queued sends")
+            loop.call_soon_threadsafe(forwarder.force_stop.set)
+            return
+        stopping.append(True)
+        logger.info("Shutdown requested, draining queued sends (signal again to stop now)...")
+        forwarder.running = False
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_stop)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops have no add_signal_handler.
+            signal.signal(sig, request_stop)
+
+async def run_daemon(args):
+    """
+    Unattended entry point: forwards the selected saved profiles until a signal
+    arrives. The user session (if any) must already be authorized interactively.
+    As worker --worker of a sharded deployment, only the source chats of its
+    shard are read (see ShardSupervisor). Returns EXIT_CONFIG_ERROR when the
+    credentials, profiles, source chats or sessions need fixing before it can run.
+    """
+    fake = args.backend == 'fake'
+    credentials = {}
+    if not fake:
+        try:
+            credentials = load_daemon_credentials(args.key_file)
+        except Exception as e:
+            logger.error(f"Error reading credentials: {e}")
+            return EXIT_CONFIG_ERROR
+        missing = [key for key in ('api_id', 'api_hash', 'bot_token') if not credentials.get(key)]
+        if missing:
+            logger.error(f"Missing credentials: {', '.join(missing)}")
+            return EXIT_CONFIG_ERROR
+    profiles = load_profiles()
+    profile_names = list(profiles) if args.all_profiles else args.profile
+    unknown = [name for name in profile_names if name not in profiles]
+    if not profile_names or unknown:
+        logger.error(f"Unknown or no profiles selected: {', '.join(unknown) or '-'}")
+        return EXIT_CONFIG_ERROR
+    worker = args.worker
+    shard = (worker, args.workers) if worker is not None else None
+
+    shared_bots = False
+    if fake:
+        from fake_telegram import FakeTelegramClient
+        server = {}
+        readers = [FakeTelegramClient(server, latency=FAKE_LATENCY)]
+        senders = [FakeTelegramClient(server, latency=FAKE_LATENCY)]
+    else:
+        tokens = [credentials['bot_token']] + credentials['extra_bot_tokens']
+        bots = [('session_bot' if index == 0 else f'session_bot_{index + 1}', token)
+                for index, token in enumerate(tokens)]
+        bots, shared_bots = worker_share(bots, worker, args.workers)
+        senders = []
+        for session, token in bots:
+            session = worker_session(session, worker) if shared_bots else session
+            client = TelegramClient(session, int(credentials['api_id']), credentials['api_hash'])
+            try:
+                await client.start(bot_token=token)
+            except (AccessTokenInvalidError, ApiIdInvalidError) as e:
+                logger.error(f"Bot session '{session}' cannot log in: {e}")
+                for client in senders:
+                    await client.disconnect()
+                return EXIT_CONFIG_ERROR
+            senders.append(client)
+        readers = []
+        if credentials.get('user_api_id') and credentials.get('user_api_hash'):
+            sessions, shared_readers = worker_share(args.reader_session or ['session_user'], worker, args.workers)
+            for session in sessions:
+                session = worker_session(session, worker) if shared_readers else session
+                client = TelegramClient(session, int(credentials['user_api_id']), credentials['user_api_hash'])
+                readers.append(client)
+                await client.connect()
+                if not await client.is_user_authorized():
+                    logger.error(f"User session '{session}' is not authorized; log in once interactively first.")
+                    for client in readers + senders:
+                        await client.disconnect()
+                    return EXIT_CONFIG_ERROR
+    sender_client = senders[0] if len(senders) == 1 else SenderPool(senders)
+    if readers:
+        reader_client = readers[0] if len(readers) == 1 else ReaderPool(readers)
+    else:
+        reader_client = senders[0]
+
+    state_file = FAKE_STATE_FILE if fake else STATE_FILE
+    # Workers sharing the same bots share its overall send limit too.
+    send_rate = GLOBAL_SEND_RATE * len(senders) / (args.workers if shared_bots else 1)
+    metrics_port = args.metrics_port + worker if args.metrics_port and worker is not None else args.metrics_port
+    forwarder = TelegramForwarder(reader_client, sender_client, ingest_mode=args.mode,
+                                  checkpoint_store=CheckpointStore(state_file),
+                                  max_catchup=args.max_catchup, metrics_port=metrics_port,
+                                  dedup_cache=DedupCache(state_file, window=args.dedup_window, shared=shard is not None),
+                                  filter_workers=args.filter_workers, media_workers=args.media_workers,
+                                  global_send_rate=send_rate, shard=shard)
+    if fake:
+        # Fake chats have no Telegram limits; measure the processing instead.
+        unlimited = 10 ** 6
+        forwarder.scheduler = SendScheduler(MAX_CONCURRENT_SENDS, unlimited, unlimited, unlimited)
+    selected = [profile for profile in (forwarder.build_profile(name, profiles[name]) for name in profile_names)
+                if profile]
+    # A source chat the reader cannot see would fail again after every restart.
+    unreadable = await forwarder.unreadable_sources(selected)
+    if unreadable:
+        for chat_id, error in unreadable.items():
+            logger.error(f"Cannot read source chat {chat_id}: {error}")
+        forwarder.checkpoints.close()
+        forwarder.dedup.close()
+        for client in {reader_client, *senders}:
+            await client.disconnect()
+        return EXIT_CONFIG_ERROR
+    tracer.sample_rate = args.trace_sample
+    # With --all-profiles, profiles saved later are picked up too.
+    forwarder.watch_profiles(profile_store, None if args.all_profiles else profile_names)
+    install_signal_handlers(forwarder)
+    shard_label = f" [worker {worker + 1}/{args.workers}]" if shard else ""
+    logger.info(f"Forwarding profiles{shard_label}: {', '.join(profile_names)} ({args.mode} mode)")
+    background = []
+    registry = WorkerRegistry(state_file) if shard else None
+    if registry:
+        background.append(asyncio.ensure_future(report_heartbeat(forwarder, registry, worker)))
+    if fake:
+        background.append(asyncio.ensure_future(post_fake_traffic(forwarder, readers[0], senders[0], args.fake_rate)))
+    try:
+        await forwarder.run_profiles(selected)
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        if registry:
+            registry.close()
+        forwarder.checkpoints.close()
+        forwarder.dedup.close()
+        for client in {reader_client, *senders}:
+            await client.disconnect()
+    return 1 if forwarder.force_stop.is_set() else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Soluify Telegram Copy & Paste Bot")
+    parser.add_argument('--daemon', action='store_true',
+                        help="run headless: no menu, no prompts, stop with SIGTERM/SIGINT")
+    parser.add_argument('--profile', action='append', default=[],
+                        help="saved profile to forward (repeatable)")
+    parser.add_argument('--all-profiles', action='store_true', help="forward every saved profile")
+    parser.add_argument('--key-file', help="JSON file with api_id, api_hash, bot_token, user_api_id, user_api_hash")
+    parser.add_argument('--mode', choices=('push', 'poll'), default=INGEST_MODE, help="ingestion mode")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help="serve metrics on 127.0.0.1:PORT")
+    parser.add_argument('--max-catchup', type=int, default=MAX_CATCHUP_MESSAGES,
+                        help="messages per source to catch up on at startup")
+    parser.add_argument('--dedup-window', type=int, default=DEDUP_WINDOW,
+                        help="seconds a forwarded message suppresses identical copies (0 = off)")
+    parser.add_argument('--filter-workers', type=int, default=FILTER_WORKERS, help="filter/clean stage workers")
+    parser.add_argument('--media-workers', type=int, default=MEDIA_WORKERS, help="media fetch stage workers")
+    parser.add_argument('--output', choices=('color', 'plain', 'quiet', 'json'),
+                        help="console output (daemon default: color on a terminal, plain otherwise)")
+    parser.add_argument('--trace-sample', type=float, default=TRACE_SAMPLE_RATE,
+                        help=f"share of messages to trace into {TRACE_FILE} (0-1)")
+    parser.add_argument('--trace-summary', nargs='?', const=TRACE_FILE, metavar='FILE',
+                        help="print the slowest stages of a trace file and exit")
+    parser.add_argument('--reader-session', action='append', default=[],
+                        help="user session to read with (repeatable, default session_user); several form a reader pool")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="split the source chats over this many worker processes")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--backend', choices=('telegram', 'fake'), default='telegram',
+                        help="'fake' runs without accounts on the fake client of fake_telegram.py (local testing)")
+    parser.add_argument('--fake-rate', type=int, default=1,
+                        help="fake backend: messages posted per second to every source chat")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or (args.worker is not None and not 0 <= args.worker < args.workers):
+        parser.error("--workers must be at least 1 (and --worker below it)")
+    return args
+
+# ------------------------------------------------------------------------------
+# Sharded deployment: one supervisor process, N forwarding worker processes
+# ------------------------------------------------------------------------------
+class WorkerRegistry:
+    """
+    Heartbeats of the worker processes, kept in the shared state database.
+    """
+    def __init__(self, path=STATE_FILE):
+        self.conn = connect_state_db(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            "worker INTEGER PRIMARY KEY, pid INTEGER NOT NULL, heartbeat REAL NOT NULL, "
+            "forwarded INTEGER NOT NULL, queued INTEGER NOT NULL, disconnected INTEGER NOT NULL)"
+        )
+        self.conn.commit()
+
+    def beat(self, worker, pid, forwarded, queued, disconnected):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO workers (worker, pid, heartbeat, forwarded, queued, disconnected) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (worker, pid, time.time(), forwarded, queued, disconnected)
+        )
+        self.conn.commit()
+
+    def heartbeats(self):
+        """
+        Returns worker -> (pid, heartbeat, forwarded, queued, disconnected).
+        """
+        rows = self.conn.execute(
+            "SELECT worker, pid, heartbeat, forwarded, queued, disconnected FROM workers"
+        ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def clear(self):
+        self.conn.execute("DELETE FROM workers")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def worker_share(items, worker, workers):
+    """
+    The part of an account pool a worker uses: its own slice when the pool has an
+    account for every worker, otherwise the whole pool (shared, returns True).
+    """
+    if worker is None:
+        return items, False
+    if len(items) >= workers:
+        return items[worker::workers], False
+    return items, True
+
+def worker_session(session, worker):
+    """
+    Session name of a worker process for a shared account. The base session is
+    copied on first use, so one interactive login serves every worker.
+    """
+    name = f"{session}.w{worker}"
+    if not os.path.exists(name + '.session') and os.path.exists(session + '.session'):
+        shutil.copyfile(session + '.session', name + '.session')
+    return name
+
+async def post_fake_traffic(forwarder, reader, sender, rate):
+    """
+    Fake backend: posts `rate` synthetic messages per second to every source chat
+    this process reads, and forgets what the fake bot sent.
+    """
+    from fake_telegram import synthetic_text
+    index = 0
+    while True:
+        started = time.monotonic()
+        for chat_id in list(forwarder.routes):
+            for _ in range(rate):
+                reader.post(chat_id, f"[fake {chat_id}:{index}] {synthetic_text(index)}")
+                index += 1
+        sender.sent.clear()
+        await asyncio.sleep(max(0.0, 1 - (time.monotonic() - started)))
+
+async def report_heartbeat(forwarder, registry, worker):
+    while True:
+        registry.beat(worker, os.getpid(), int(metrics.total('soluify_messages_forwarded_total')),
+                      forwarder.scheduler.queue_depth(), forwarder.supervisor.down() if forwarder.supervisor else 0)
+        await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+class ShardSupervisor:
+    """
+    Runs the daemon as `workers` processes. Each forwards the source chats of one
+    shard (see TelegramForwarder.owns), so a source stays in one process and its
+    messages keep their order. Workers report heartbeats to the state database;
+    one that exits or stops reporting is restarted, with a growing delay while
+    it keeps crashing. A worker exiting with EXIT_CONFIG_ERROR stops everything.
+    """
+    def __init__(self, argv, workers, state_file=STATE_FILE):
+        self.argv = list(argv)
+        self.workers = workers
+        self.registry = WorkerRegistry(state_file)
+        self.processes = {}
+        self.started = {}
+        self.next_start = {}
+        self.restarts = defaultdict(int)
+        # Workers that reported at least once since their (re)start.
+        self.reported = set()
+        self.forwarded = {}
+        self.running = True
+        # Set by a second shutdown signal (see install_signal_handlers).
+        self.force_stop = asyncio.Event()
+
+    def command(self, index):
+        return [sys.executable, os.path.abspath(__file__), *self.argv, '--worker', str(index)]
+
+    def start(self, index):
+        # In their own session, Ctrl+C in the terminal only reaches the supervisor,
+        # which then passes one signal on to each worker (see stop_all).
+        self.processes[index] = subprocess.Popen(self.command(index), start_new_session=True)
+        self.started[index] = time.monotonic()
+        self.reported.discard(index)
+        logger.info(f"Worker {index + 1}/{self.workers} started (pid {self.processes[index].pid})")
+
+    def check(self):
+        """
+        Restarts exited or silent workers. Returns EXIT_CONFIG_ERROR if a worker
+        exited with it (restarting would not help), else None.
+        """
+        beats = self.registry.heartbeats()
+        for index in range(self.workers):
+            process = self.processes.get(index)
+            if process is None:
+                if time.monotonic() >= self.next_start[index]:
+                    self.start(index)
+                continue
+            beat = beats.get(index)
+            if beat and beat[0] == process.pid:
+                self.reported.add(index)
+            if index in self.reported:
+                silent = time.time() - beat[1]
+            else:
+                silent = time.monotonic() - self.started[index]
+            code = process.poll()
+            if code is None and silent > WORKER_HEARTBEAT_TIMEOUT:
+                logger.error(f"Worker {index + 1} stopped reporting, restarting it")
+                process.kill()
+                code = process.wait()
+            if code is None:
+                continue
+            if code == EXIT_CONFIG_ERROR:
+                return code
+            del self.processes[index]
+            # A worker that ran for a while starts over with the shortest delay.
+            if time.monotonic() - self.started[index] > WORKER_RESTART_MAX_DELAY:
+                self.restarts[index] = 0
+            delay = min(WORKER_RESTART_MAX_DELAY, WORKER_RESTART_DELAY * 2 ** self.restarts[index])
+            self.restarts[index] += 1
+            self.next_start[index] = time.monotonic() + delay
+            metrics.inc('soluify_worker_restarts_total', worker=index + 1)
+            logger.error(f"Worker {index + 1} exited with code {code}, restarting in {delay}s")
+            console.status(f"Worker {index + 1} exited with code {code}, restarting in {delay}s...", ALERT_COLOR, ALERT_COLOR)
+        return None
+
+    def report(self, elapsed):
+        beats = self.registry.heartbeats()
+        alive = sum(1 for index in self.processes if index in self.reported)
+        forwarded = queued = disconnected = 0
+        rate = 0.0
+        for index, (pid, _, count, depth, down) in beats.items():
+            # A restarted worker counts from zero again.
+            rate += max(0, count - self.forwarded.get(index, 0)) / elapsed if elapsed else 0.0
+            self.forwarded[index] = count
+            forwarded += count
+            queued += depth
+            disconnected += down
+        line = (f"Workers: {alive}/{self.workers} up, {forwarded} forwarded ({rate:.1f}/s), {queued} queued, "
+                f"{disconnected} disconnected accounts, {sum(self.restarts.values())} restarts")
+        logger.info(line)
+        console.status(line, MAIN_COLOR_START, MAIN_COLOR_END, "📊")
+
+    async def stop_all(self):
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        forwarded = False
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        while any(process.poll() is None for process in self.processes.values()) and time.monotonic() < deadline:
+            # Waiting first keeps the two signals apart, so a worker does not see them as one.
+            await asyncio.sleep(0.2)
+            if self.force_stop.is_set() and not forwarded:
+                # Signalled again while the workers drain: pass it on so they stop now.
+                for process in self.processes.values():
+                    if process.poll() is None:
+                        process.terminate()
+                forwarded = True
+        for process in self.processes.values():
+            if process.poll() is None:
+                logger.error(f"Worker pid {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.wait()
+
+    async def run(self):
+        self.registry.clear()
+        for index in range(self.workers):
+            self.start(index)
+        install_signal_handlers(self)
+        last_report = time.monotonic()
+        code = 0
+        try:
+            while self.running:
+                await asyncio.sleep(1)
+                if not self.running:
+                    break
+                failed = self.check()
+                if failed is not None:
+                    logger.error(f"Worker configuration error (exit code {failed}), stopping")
+                    code = failed
+                    break
+                if METRICS_SUMMARY_INTERVAL and time.monotonic() - last_report >= METRICS_SUMMARY_INTERVAL:
+                    self.report(time.monotonic() - last_report)
+                    last_report = time.monotonic()
+        finally:
+            await self.stop_all()
+            self.registry.close()
+        return 1 if self.force_stop.is_set() and not code else code
+
 # ------------------------------------------------------------------------------
 # Entry point
 # ------------------------------------------------------------------------------
 if __name__ == "__main__":
+    args = parse_args()
+    if args.output or args.daemon:
+        configure_output(args.output or ('color' if sys.stdout.isatty() else 'plain'))
+    if args.trace_summary:
+        tracer.load(args.trace_summary)
+        print('\n'.join(tracer.summary()))
+        sys.exit(0)
     loop = asyncio.get_event_loop()
+    if args.daemon and args.workers > 1 and args.worker is None:
+        supervisor = ShardSupervisor(sys.argv[1:], args.workers,
+                                     FAKE_STATE_FILE if args.backend == 'fake' else STATE_FILE)
+        sys.exit(loop.run_until_complete(supervisor.run()))
+    if args.daemon:
+        sys.exit(loop.run_until_complete(run_daemon(args)))
     loop.run_until_complete(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# Soluify  |  Your #1 IT Problem Solver  |  {telegram-copypaste-bot benchmark}
+# ==============================================================================
+# Offline benchmark for the forwarding pipeline of MainBot.py.
+#
+# A FakeTelegramClient (fake_telegram.py) stands in for TelegramClient: no
+# accounts, no network, simulated RPC latency and FloodWaits. The benchmark posts
+# synthetic messages to fake source chats, drives forward_messages_to_channels
+# and clean_message_text, and reports throughput, end-to-end latency
+# percentiles and peak memory.
+#
+# Usage:
+#   python benchmark.py --messages 500 --sources 10 --destinations 20 --latency 20
+#   python benchmark.py --mode poll --media-rate 0.3 --flood-rate 0.01
+# ==============================================================================
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import random
+import re
+import time
+import tracemalloc
+
+import MainBot
+from fake_telegram import FakeTelegramClient, synthetic_text
+
+MARKER = re.compile(r'\[bench (-?\d+):(\d+)\]')
+
+# ------------------------------------------------------------------------------
+# Benchmarks
+# ------------------------------------------------------------------------------
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def bench_pipeline(args):
+    """
+    Posts args.messages messages across the source chats and measures how long it
+    takes until every destination received them.
+    """
+    MainBot.POLL_INTERVAL = args.poll_interval
+    server = {}
+    reader = FakeTelegramClient(server, latency=args.latency / 1000,
+                                flood_rate=args.flood_rate, flood_seconds=args.flood_seconds)
+    sender = reader if args.same_client else FakeTelegramClient(
+        server, latency=args.latency / 1000, flood_rate=args.flood_rate, flood_seconds=args.flood_seconds)
+    sources = [-1000 - i for i in range(args.sources)]
+    destinations = [-2000 - i for i in range(args.destinations)]
+    forwarder = MainBot.TelegramForwarder(reader, sender, ingest_mode=args.mode,
+                                          checkpoint_store=MainBot.CheckpointStore(':memory:'),
+                                          dedup_cache=MainBot.DedupCache(':memory:'))
+    forwarder.scheduler = MainBot.SendScheduler(args.concurrency, args.global_rate, args.chat_rate, args.chat_rate)
+    task = asyncio.ensure_future(forwarder.forward_messages_to_channels(
+        sources, destinations, [], args.signature, interactive=False))
+    # Wait until the forwarder has registered its sources (and handlers in push mode).
+    while len(forwarder.routes) < len(sources) or (args.mode == 'push' and not reader.handlers):
+        await asyncio.sleep(0.01)
+
+    posted = {}
+    start = time.monotonic()
+    for index in range(args.messages):
+        chat_id = random.choice(sources)
+        text = f"[bench {chat_id}:{index}] {synthetic_text(index)}"
+        media = bytes(args.media_size) if random.random() < args.media_rate else None
+        reader.post(chat_id, text, media)
+        posted[(chat_id, index)] = time.monotonic()
+        if args.interval:
+            await asyncio.sleep(args.interval / 1000)
+
+    expected = len(posted) * len(destinations)
+    deadline = time.monotonic() + args.timeout
+    delivered = {}
+    seen = 0
+    while time.monotonic() < deadline:
+        for sent_at, dest_id, text in sender.sent[seen:]:
+            match = MARKER.search(text or '')
+            if match:
+                key = (int(match.group(1)), int(match.group(2)), dest_id)
+                delivered.setdefault(key, sent_at)
+        seen = len(sender.sent)
+        if len(delivered) >= expected:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - start
+    forwarder.running = False
+    await task
+    await forwarder.scheduler.close()
+
+    latencies = [sent_at - posted[(chat_id, index)] for (chat_id, index, _), sent_at in delivered.items()]
+    complete = {(chat_id, index) for chat_id, index, _ in delivered}
+    return {
+        'messages': len(posted),
+        'deliveries': f"{len(delivered)}/{expected}",
+        'messages/sec': len(complete) / elapsed if elapsed else 0.0,
+        'p50 latency (ms)': percentile(latencies, 0.50) * 1000,
+        'p99 latency (ms)': percentile(latencies, 0.99) * 1000,
+        'flood waits': sender.floods,
+    }
+
+def bench_clean_text(args):
+    """
+    Times clean_message_text on unique synthetic texts (no cache hits).
+    """
+    forwarder = MainBot.TelegramForwarder(None, None, checkpoint_store=MainBot.CheckpointStore(':memory:'),
+                                          dedup_cache=MainBot.DedupCache(':memory:'))
+    texts = [synthetic_text(index) + f" #{index}" for index in range(args.clean_texts)]
+    start = time.perf_counter()
+    for text in texts:
+        forwarder.clean_message_text(text)
+    elapsed = time.perf_counter() - start
+    return {'texts': len(texts), 'texts/sec': len(texts) / elapsed if elapsed else 0.0,
+            'us/text': elapsed / len(texts) * 1e6 if texts else 0.0}
+
+def report(title, results):
+    print(f"\n{title}")
+    print("-" * len(title))
+    for key, value in results.items():
+        print(f"  {key:<20} {value:.2f}" if isinstance(value, float) else f"  {key:<20} {value}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Soluify forwarder.")
+    parser.add_argument('--messages', type=int, default=300, help="messages to post")
+    parser.add_argument('--sources', type=int, default=10, help="source chats")
+    parser.add_argument('--destinations', type=int, default=10, help="destination chats")
+    parser.add_argument('--latency', type=float, default=20, help="simulated RPC latency in ms")
+    parser.add_argument('--interval', type=float, default=0, help="ms between posted messages (0 = burst)")
+    parser.add_argument('--media-rate', type=float, default=0.2, help="fraction of messages with media")
+    parser.add_argument('--media-size', type=int, default=256 * 1024, help="bytes per media file")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="probability of a FloodWait per send")
+    parser.add_argument('--flood-seconds', type=int, default=1, help="seconds requested by injected FloodWaits")
+    parser.add_argument('--mode', choices=('push', 'poll'), default='push', help="ingestion mode")
+    parser.add_argument('--poll-interval', type=float, default=0.1, help="seconds between polls in poll mode")
+    parser.add_argument('--same-client', action='store_true', help="reader is the sender (native media copy)")
+    parser.add_argument('--signature', default='', help="custom signature to append")
+    parser.add_argument('--concurrency', type=int, default=MainBot.MAX_CONCURRENT_SENDS, help="sends in flight")
+    parser.add_argument('--global-rate', type=float, default=1000, help="global sends/second")
+    parser.add_argument('--chat-rate', type=float, default=100, help="sends/second per destination")
+    parser.add_argument('--clean-texts', type=int, default=5000, help="texts for the clean_message_text benchmark")
+    parser.add_argument('--timeout', type=float, default=120, help="seconds to wait for all deliveries")
+    parser.add_argument('--seed', type=int, default=1, help="random seed")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    MainBot.logger.setLevel(logging.CRITICAL)
+    MainBot.configure_output('quiet')
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pipeline = asyncio.run(bench_pipeline(args))
+        clean = bench_clean_text(args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pipeline['peak memory (MiB)'] = peak / (1024 * 1024)
+    report(f"Forwarding pipeline ({args.mode} mode)", pipeline)
+    report("clean_message_text", clean)
+
+if __name__ == "__main__":
+    main()
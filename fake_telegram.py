@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# Soluify  |  Your #1 IT Problem Solver  |  {telegram-copypaste-bot fake client}
+# ==============================================================================
+# In-process stand-in for TelegramClient (no accounts, no network), shared by
+# benchmark.py, test_forwarding.py and the `--backend fake` mode of MainBot.py.
+# It simulates RPC latency and can inject FloodWait errors.
+# ==============================================================================
+import asyncio
+import itertools
+import random
+import time
+
+from telethon import events
+from telethon.errors import FloodWaitError
+
+SIGNATURE_TAIL = ("\n\n📹 YouTube (https://youtube.com/@soluify) | ✅ Telegram (http://t.me/soluify) "
+                  "🕊 Twitter (https://x.com/soluify) | 🌐 DAPP (https://soluify.app)")
+
+# ------------------------------------------------------------------------------
+# Fake Telegram objects
+# ------------------------------------------------------------------------------
+class FakeFile:
+    def __init__(self, file_id, size):
+        self.id = file_id
+        self.name = None
+        self.ext = '.jpg'
+        self.size = size
+
+class FakePhoto:
+    def __init__(self, photo_id):
+        self.id = photo_id
+
+class FakeMessage:
+    def __init__(self, chat_id, message_id, text, media=None, grouped_id=None, photo_id=None):
+        self.chat_id = chat_id
+        self.id = message_id
+        self.text = text
+        self.media = media
+        self.file = FakeFile(media, len(media)) if media else None
+        # Media with a photo id can be cached and deduplicated like real photos.
+        self.photo = FakePhoto(photo_id) if photo_id is not None else None
+        self.document = None
+        self.grouped_id = grouped_id
+        self.noforwards = False
+
+class FakeEvent:
+    def __init__(self, chat_id, messages):
+        self.chat_id = chat_id
+        self.messages = messages
+        self.message = messages[0]
+        self.grouped_id = messages[0].grouped_id
+
+class FakeTelegramClient:
+    """
+    In-process stand-in for TelegramClient with the subset of the API the
+    forwarder uses. Every call sleeps `latency` seconds; sends raise FloodWaitError
+    with probability `flood_rate`. Clients created with the same `server` share
+    the posted messages, like two accounts in the same chats.
+    """
+    def __init__(self, server=None, latency=0.0, flood_rate=0.0, flood_seconds=1):
+        self.server = server if server is not None else {}
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.connected = True
+        self.handlers = []
+        self.sent = []
+        self.floods = 0
+        self.ids = itertools.count(1)
+
+    async def rpc(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def is_connected(self):
+        return self.connected
+
+    async def connect(self):
+        await self.rpc()
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def get_me(self):
+        await self.rpc()
+        if not self.connected:
+            raise ConnectionError('Cannot send requests while disconnected')
+        return None
+
+    # -- Source side ----------------------------------------------------------
+    def post(self, chat_id, text, media=None, grouped_id=None):
+        """
+        Publishes a message to a fake chat and notifies the event handlers.
+        """
+        messages = self.server.setdefault(chat_id, [])
+        message = FakeMessage(chat_id, len(messages) + 1, text, media, grouped_id)
+        messages.append(message)
+        self.notify(chat_id, [message])
+        return message
+
+    def post_album(self, chat_id, texts, media):
+        grouped_id = next(self.ids)
+        messages = self.server.setdefault(chat_id, [])
+        album = []
+        for text, data in zip(texts, media):
+            message = FakeMessage(chat_id, len(messages) + 1, text, data, grouped_id)
+            messages.append(message)
+            album.append(message)
+        self.notify(chat_id, album)
+        return album
+
+    def notify(self, chat_id, messages):
+        for callback, builder in list(self.handlers):
+            if isinstance(builder, events.Album):
+                if len(messages) < 2:
+                    continue
+                event = FakeEvent(chat_id, messages)
+                if builder.func is None or builder.func(event):
+                    asyncio.ensure_future(callback(event))
+            else:
+                for message in messages:
+                    event = FakeEvent(chat_id, [message])
+                    if builder.func is None or builder.func(event):
+                        asyncio.ensure_future(callback(event))
+
+    def add_event_handler(self, callback, event):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback):
+        self.handlers = [(cb, ev) for cb, ev in self.handlers if cb is not callback]
+
+    async def get_messages(self, entity, limit=None, min_id=0, add_offset=0):
+        await self.rpc()
+        newest_first = self.server.get(entity, [])[::-1][add_offset:]
+        result = [message for message in newest_first if message.id > min_id]
+        return result[:limit] if limit else result
+
+    async def iter_messages(self, entity, limit=None, min_id=0, reverse=False):
+        messages = [message for message in self.server.get(entity, []) if message.id > min_id]
+        if not reverse:
+            messages.reverse()
+        for start in range(0, len(messages), 100):
+            await self.rpc()
+            for message in messages[start:start + 100]:
+                yield message
+
+    async def download_media(self, media, file=None):
+        await self.rpc()
+        if file is bytes:
+            return media
+        if isinstance(file, str):
+            path = file + 'media.jpg'
+            with open(path, 'wb') as f:
+                f.write(media)
+            return path
+        file.write(media)
+        return file
+
+    async def iter_download(self, media, offset=0, limit=None, request_size=None, file_size=None):
+        end = len(media) if limit is None else min(len(media), offset + limit * request_size)
+        for start in range(offset, end, request_size):
+            await self.rpc()
+            yield media[start:min(end, start + request_size)]
+
+    async def upload_file(self, file, file_size=None, file_name=None, **kwargs):
+        await self.rpc()
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                return f.read()
+        return file if isinstance(file, bytes) else file.read()
+
+    # -- Destination side -----------------------------------------------------
+    def maybe_flood(self):
+        if self.flood_rate and random.random() < self.flood_rate:
+            self.floods += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    async def send_message(self, entity, message, **kwargs):
+        await self.rpc()
+        self.maybe_flood()
+        self.sent.append((time.monotonic(), entity, message))
+
+    async def send_file(self, entity, file, caption=None, **kwargs):
+        await self.rpc()
+        self.maybe_flood()
+        captions = caption if isinstance(caption, list) else [caption]
+        self.sent.append((time.monotonic(), entity, '\n'.join(c or '' for c in captions)))
+
+def synthetic_text(index):
+    words = ' '.join(random.choice(('alpha', 'beta', 'gamma', 'delta', 'launch', 'update')) for _ in range(30))
+    return f"Post {index}: {words}" + (SIGNATURE_TAIL if index % 2 else "")
@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# Soluify  |  Your #1 IT Problem Solver  |  {telegram-copypaste-bot tests}
+# ==============================================================================
+# Regression tests for the forwarding pipeline of MainBot.py, run offline on the
+# fake client of fake_telegram.py (no accounts, no network).
+#
+# Usage:
+#   python -m pytest -q test_forwarding.py
+#   python -m unittest test_forwarding
+# ==============================================================================
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from telethon.errors import FloodWaitError
+
+import MainBot
+from fake_telegram import SIGNATURE_TAIL, FakeMessage, FakeTelegramClient
+
+SOURCE = -1
+OTHER_SOURCE = -2
+DESTINATION = -10
+
+def setUpModule():
+    MainBot.logger.setLevel(logging.CRITICAL)
+    MainBot.configure_output('quiet')
+
+class ForwarderTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs a forwarder for the profile 'p' over two fake clients sharing one server.
+    """
+    async def asyncSetUp(self):
+        self.server = {}
+        self.reader = FakeTelegramClient(self.server)
+        self.sender = FakeTelegramClient(self.server)
+        self.checkpoints = MainBot.CheckpointStore(':memory:')
+        self.dedup = MainBot.DedupCache(':memory:')
+        self.forwarder = MainBot.TelegramForwarder(self.reader, self.sender, checkpoint_store=self.checkpoints,
+                                                   dedup_cache=self.dedup)
+        self.forwarder.scheduler = MainBot.SendScheduler(10, 1000, 1000, 1000)
+        self.task = None
+
+    async def asyncTearDown(self):
+        if self.task:
+            self.forwarder.running = False
+            await self.task
+        await self.forwarder.scheduler.close()
+
+    async def start(self, sources=(SOURCE,)):
+        self.task = asyncio.ensure_future(self.forwarder.forward_messages_to_channels(
+            list(sources), [DESTINATION], [], '', profile_name='p', interactive=False))
+        await self.wait_for(lambda: self.reader.handlers)
+
+    async def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail(f"Timed out; sent so far: {self.sent()}")
+            await asyncio.sleep(0.01)
+
+    def sent(self):
+        return [text for _, _, text in self.sender.sent]
+
+    def checkpoint(self, source=SOURCE):
+        return self.checkpoints.get('p', source)
+
+    def store_silently(self, source, text):
+        # A message the reader missed: on the server, but never pushed.
+        messages = self.server.setdefault(source, [])
+        messages.append(FakeMessage(source, len(messages) + 1, text))
+
+    def fail_preparing(self, failures):
+        """
+        Makes process_message raise for the texts in `failures` (text -> count).
+        """
+        process_message = self.forwarder.process_message
+
+        async def flaky(messages, profile):
+            if failures.get(messages[0].text, 0):
+                failures[messages[0].text] -= 1
+                raise RuntimeError(f"upload of {messages[0].text} failed")
+            return await process_message(messages, profile)
+        self.forwarder.process_message = flaky
+
+class FilterTest(unittest.TestCase):
+    def test_keywords_and_blacklist(self):
+        engine = MainBot.FilterEngine(['Launch', 'airdrop'], ['scam'])
+        self.assertTrue(engine.matches('AIRDROP starts now'))
+        self.assertFalse(engine.matches('Weekly update'))
+        self.assertFalse(engine.matches('Launch airdrop, not a SCAM'))
+        self.assertFalse(engine.matches(None))
+
+    def test_no_keywords_match_everything_but_the_blacklist(self):
+        engine = MainBot.FilterEngine([], ['scam'])
+        self.assertTrue(engine.matches('Weekly update'))
+        self.assertTrue(engine.matches(''))
+        self.assertFalse(engine.matches('Scam alert'))
+
+    def test_signature_is_removed(self):
+        forwarder = MainBot.TelegramForwarder(None, None, checkpoint_store=MainBot.CheckpointStore(':memory:'),
+                                              dedup_cache=MainBot.DedupCache(':memory:'))
+        self.assertEqual(forwarder.clean_message_text('Launch today' + SIGNATURE_TAIL), 'Launch today')
+        self.assertEqual(forwarder.clean_message_text('No signature\n\nhere'), 'No signature\n\nhere')
+
+class GapFillTest(ForwarderTestCase):
+    async def test_gap_fill_recovers_message_behind_pushed_one(self):
+        await self.start()
+        self.reader.post(SOURCE, 'A')
+        await self.wait_for(lambda: self.sent() == ['A'])
+        self.store_silently(SOURCE, 'B')
+        self.reader.post(SOURCE, 'C')
+        await self.wait_for(lambda: self.sent() == ['A', 'C'])
+        self.assertEqual(self.checkpoint(), 1)
+
+        self.forwarder.connection_restored('reader')
+        await self.wait_for(lambda: self.sent() == ['A', 'C', 'B'])
+        await self.wait_for(lambda: self.checkpoint() == 3)
+
+    async def test_reconnect_catches_up_when_new_message_is_pushed_first(self):
+        await self.start()
+        self.reader.post(SOURCE, 'A')
+        await self.wait_for(lambda: self.sent() == ['A'])
+        self.reader.connected = False
+        self.store_silently(SOURCE, 'B')
+        self.store_silently(SOURCE, 'C')
+        await self.wait_for(lambda: self.forwarder.supervisor.reconnects['reader'])
+        self.reader.post(SOURCE, 'D')
+        await self.wait_for(lambda: sorted(self.sent()) == ['A', 'B', 'C', 'D'])
+        await self.wait_for(lambda: self.checkpoint() == 4)
+
+class CheckpointTest(ForwarderTestCase):
+    async def test_checkpoint_stays_below_pending_send(self):
+        release = asyncio.Event()
+        send_message = self.sender.send_message
+
+        async def slow_send(entity, message, **kwargs):
+            if message == 'A':
+                await release.wait()
+            return await send_message(entity, message, **kwargs)
+        self.sender.send_message = slow_send
+        await self.start()
+        self.reader.post(SOURCE, 'A')
+        self.reader.post(SOURCE, 'B')
+        await self.wait_for(lambda: self.forwarder.profiles['p'].last_message_ids[SOURCE] == 2)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.sent(), [])
+        self.assertEqual(self.checkpoint(), 0)
+
+        release.set()
+        await self.wait_for(lambda: self.sent() == ['A', 'B'])
+        await self.wait_for(lambda: self.checkpoint() == 2)
+
+    async def test_failed_media_preparation_is_retried(self):
+        self.fail_preparing({'A': 1})
+        with mock.patch.object(MainBot, 'RETRY_DELAY', 0.01):
+            await self.start()
+            self.reader.post(SOURCE, 'A')
+            self.reader.post(SOURCE, 'B')
+            await self.wait_for(lambda: self.sent() == ['A', 'B'])
+        await self.wait_for(lambda: self.checkpoint() == 2)
+
+    async def test_message_is_dropped_after_max_retries(self):
+        dropped = MainBot.metrics.total('soluify_messages_dropped_total')
+        self.fail_preparing({'A': MainBot.MAX_RETRIES})
+        with mock.patch.object(MainBot, 'RETRY_DELAY', 0.01):
+            await self.start()
+            self.reader.post(SOURCE, 'A')
+            self.reader.post(SOURCE, 'B')
+            await self.wait_for(lambda: self.sent() == ['B'])
+        await self.wait_for(lambda: self.checkpoint() == 2)
+        self.assertEqual(MainBot.metrics.total('soluify_messages_dropped_total'), dropped + 1)
+
+class DedupTest(ForwarderTestCase):
+    async def test_repost_in_another_source_is_sent_once(self):
+        await self.start(sources=(SOURCE, OTHER_SOURCE))
+        self.reader.post(SOURCE, 'Launch today')
+        await self.wait_for(lambda: self.sent() == ['Launch today'])
+        self.reader.post(OTHER_SOURCE, 'launch   TODAY')
+        self.reader.post(OTHER_SOURCE, 'Next')
+        await self.wait_for(lambda: self.sent() == ['Launch today', 'Next'])
+        await self.wait_for(lambda: self.checkpoint(OTHER_SOURCE) == 2)
+
+    async def test_repost_with_link_preview_is_sent_once(self):
+        await self.start(sources=(SOURCE, OTHER_SOURCE))
+        for source in (SOURCE, OTHER_SOURCE):
+            messages = self.server.setdefault(source, [])
+            message = FakeMessage(source, len(messages) + 1, 'Read https://soluify.app')
+            message.media = object()  # a web page preview: media, but no file
+            messages.append(message)
+            self.reader.notify(source, [message])
+            await self.wait_for(lambda: self.checkpoint(source) == 1)
+        self.assertEqual(self.sent(), ['Read https://soluify.app'])
+
+    async def test_failed_delivery_is_not_recorded_as_duplicate(self):
+        self.fail_preparing({'Launch today': MainBot.MAX_RETRIES})
+        with mock.patch.object(MainBot, 'RETRY_DELAY', 0.01):
+            await self.start(sources=(SOURCE, OTHER_SOURCE))
+            self.reader.post(SOURCE, 'Launch today')
+            await self.wait_for(lambda: self.checkpoint() == 1)
+        self.assertEqual(self.sent(), [])
+        self.reader.post(OTHER_SOURCE, 'Launch today')
+        await self.wait_for(lambda: self.sent() == ['Launch today'])
+
+    def test_expired_entries_are_pruned_while_running(self):
+        cache = MainBot.DedupCache(':memory:', window=60)
+        self.addCleanup(cache.close)
+        cache.conn.execute("INSERT INTO dedup (key, seen) VALUES ('old', ?)", (time.time() - 120,))
+        cache.conn.commit()
+        cache.seen('p', 'new')
+        cache.confirm('p', 'new')
+        cache.last_prune -= MainBot.DEDUP_PRUNE_INTERVAL
+        cache.flush()
+        keys = [key for key, in cache.conn.execute("SELECT key FROM dedup")]
+        self.assertEqual(keys, ['p:new'])
+
+class ShutdownTest(ForwarderTestCase):
+    async def test_second_signal_stops_without_draining(self):
+        process_message = self.forwarder.process_message
+        send_message = self.sender.send_message
+
+        async def slow_process(messages, profile):
+            await asyncio.sleep(0.2)
+            return await process_message(messages, profile)
+
+        async def slow_send(entity, message, **kwargs):
+            await asyncio.sleep(0.2)
+            return await send_message(entity, message, **kwargs)
+        self.forwarder.process_message = slow_process
+        self.sender.send_message = slow_send
+        loop = asyncio.get_running_loop()
+        MainBot.install_signal_handlers(self.forwarder)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(loop.remove_signal_handler, sig)
+        await self.start()
+        for index in range(20):
+            self.reader.post(SOURCE, f"m{index}")
+        await self.wait_for(lambda: self.sent())
+
+        started = time.monotonic()
+        os.kill(os.getpid(), signal.SIGINT)
+        await asyncio.sleep(0.15)
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(self.task, 2)
+        self.task = None
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertLess(len(self.sent()), 20)
+        # Messages are sent in order, so message n is the n-th send.
+        self.assertLessEqual(self.checkpoint(), len(self.sent()))
+
+class TracerTest(ForwarderTestCase):
+    async def test_sampled_message_is_traced_through_every_stage(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'trace.jsonl')
+        tracer = MainBot.Tracer(path, sample_rate=1)
+        patch = mock.patch.object(MainBot, 'tracer', tracer)
+        patch.start()
+        self.addCleanup(patch.stop)
+        await self.start()
+        self.reader.post(SOURCE, 'Launch today')
+        await self.wait_for(lambda: tracer.finished)
+        trace = tracer.finished[0]
+        self.assertEqual([stage['stage'] for stage in trace['stages']],
+                         ['detected', 'filter', 'media', 'clean', 'queued', 'send'])
+        self.assertEqual(trace['stages'][-1]['destination'], DESTINATION)
+        tracer.file.close()
+
+        # --trace-summary reads the same trace back from the file.
+        summary = MainBot.Tracer(path)
+        summary.load()
+        self.assertEqual(list(summary.finished), [trace])
+        lines = summary.summary()
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(lines[-1].startswith(f"message 1 in {SOURCE}:"))
+
+class SendSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_flood_wait_only_slows_the_flooded_chat(self):
+        scheduler = MainBot.SendScheduler(10, 1000, 100, 5)
+        sent = []
+        flooded = []
+
+        async def send(dest_id):
+            if dest_id == -1 and not flooded:
+                flooded.append(dest_id)
+                raise FloodWaitError(request=None, capture=1)
+            sent.append((time.monotonic(), dest_id))
+        start = time.monotonic()
+        futures = [await scheduler.submit(dest_id, send) for dest_id in (-1, -2) for _ in range(3)]
+        await asyncio.gather(*futures)
+        await scheduler.close()
+
+        self.assertEqual([dest_id for _, dest_id in sent], [-2, -2, -2, -1, -1, -1])
+        self.assertTrue(all(at - start < 0.5 for at, dest_id in sent if dest_id == -2))
+        self.assertTrue(all(at - start >= 1 for at, dest_id in sent if dest_id == -1))
+        self.assertLess(scheduler.chat_buckets[-1].rate, 100)
+        self.assertEqual(scheduler.chat_buckets[-2].rate, 100)
+        self.assertEqual(scheduler.global_bucket.rate, 1000)
+
+class SenderPoolTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bots = [FakeTelegramClient(), FakeTelegramClient()]
+        self.pool = MainBot.SenderPool(self.bots)
+
+    async def test_destinations_stick_to_the_least_loaded_bot(self):
+        self.assertIs(self.pool.client_for(-10), self.bots[0])
+        self.assertIs(self.pool.client_for(-11), self.bots[1])
+        self.assertIs(self.pool.client_for(-10), self.bots[0])
+
+    async def test_flood_wait_fails_over_to_another_bot(self):
+        self.bots[0].flood_rate = 1
+        await self.pool.send_via(-10, lambda bot: bot.send_message(-10, 'one'))
+        await self.pool.send_via(-10, lambda bot: bot.send_message(-10, 'two'))
+        self.assertEqual((len(self.bots[0].sent), len(self.bots[1].sent)), (0, 2))
+        self.assertEqual(self.bots[0].floods, 1)
+
+    async def test_flood_wait_is_raised_when_every_bot_is_limited(self):
+        for bot in self.bots:
+            bot.flood_rate = 1
+        with self.assertRaises(FloodWaitError):
+            await self.pool.send_via(-10, lambda bot: bot.send_message(-10, 'one'))
+
+    async def test_disconnected_bot_hands_over_its_destinations(self):
+        self.pool.client_for(-10)
+        self.bots[0].connected = False
+        self.assertIs(self.pool.client_for(-10), self.bots[1])
+        self.assertEqual(self.pool.load, {self.bots[0]: 0, self.bots[1]: 1})
+
+class ReaderPoolTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = {}
+        self.readers = [FakeTelegramClient(self.server) for _ in range(3)]
+        self.pool = MainBot.ReaderPool(self.readers)
+        self.chats = range(-1000, -700)
+
+    async def test_chats_are_spread_over_the_accounts(self):
+        owners = {chat_id: self.pool.client_for(chat_id) for chat_id in self.chats}
+        for reader in self.readers:
+            self.assertGreater(list(owners.values()).count(reader), len(self.chats) // 6)
+        # The same chat always goes to the same account, also in a new pool.
+        other = MainBot.ReaderPool(self.readers)
+        self.assertTrue(all(other.client_for(chat_id) is owner for chat_id, owner in owners.items()))
+
+    async def test_limited_account_only_moves_its_own_chats(self):
+        owners = {chat_id: self.pool.client_for(chat_id) for chat_id in self.chats}
+        self.pool.limit(self.readers[0], 60)
+        for chat_id, owner in owners.items():
+            if owner is self.readers[0]:
+                self.assertIsNot(self.pool.client_for(chat_id), self.readers[0])
+            else:
+                self.assertIs(self.pool.client_for(chat_id), owner)
+
+    async def test_flood_wait_is_retried_on_another_account(self):
+        chat_id = self.chats[0]
+        self.server[chat_id] = [FakeMessage(chat_id, 1, 'one')]
+        owner = self.pool.client_for(chat_id)
+
+        async def flooded(*args, **kwargs):
+            raise FloodWaitError(request=None, capture=30)
+        owner.get_messages = flooded
+        messages = await self.pool.get_messages(chat_id, limit=1)
+        self.assertEqual([message.text for message in messages], ['one'])
+        self.assertIsNot(self.pool.client_for(chat_id), owner)
+
+class ProfileReloadTest(ForwarderTestCase):
+    def profile_store(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return MainBot.ProfileStore(os.path.join(directory.name, 'telegramconfiguration.json'))
+
+    async def test_saved_changes_apply_while_forwarding(self):
+        store = self.profile_store()
+        path = store.path
+        store.save('a', {'source_chat_ids': [-1], 'destination_channel_ids': [-10]})
+        store.save('b', {'source_chat_ids': [-1, -2], 'destination_channel_ids': [-20]})
+        self.forwarder.watch_profiles(store, None)
+        profiles = [MainBot.ForwardingProfile.from_config(name, config) for name, config in store.load().items()]
+        with mock.patch.object(MainBot, 'PROFILE_RELOAD_INTERVAL', 0.05):
+            self.task = asyncio.ensure_future(self.forwarder.run_profiles(profiles))
+            await self.wait_for(lambda: self.reader.handlers)
+            self.reader.post(-1, 'one')
+            await self.wait_for(lambda: sorted(dest_id for _, dest_id, _ in self.sender.sent) == [-20, -10])
+
+            # Another process (e.g. the menu) edits the file.
+            other = MainBot.ProfileStore(path)
+            other.save('a', {'source_chat_ids': [-1], 'destination_channel_ids': [-11]})
+            other.save('c', {'source_chat_ids': [-2], 'destination_channel_ids': [-30]})
+            other.delete('b')
+            await self.wait_for(lambda: sorted(self.forwarder.profiles) == ['a', 'c'])
+        self.assertEqual(self.forwarder.profiles['a'].last_message_ids, {-1: 1})
+
+        self.sender.sent.clear()
+        self.reader.post(-1, 'two')
+        self.reader.post(-2, 'three')
+        await self.wait_for(lambda: len(self.sender.sent) == 2)
+        self.assertEqual(sorted(dest_id for _, dest_id, _ in self.sender.sent), [-30, -11])
+
+    async def test_watching_ends_with_the_run(self):
+        store = self.profile_store()
+        store.save('a', {'source_chat_ids': [-1], 'destination_channel_ids': [-10]})
+        self.forwarder.watch_profiles(store, None)
+        with mock.patch.object(MainBot, 'PROFILE_RELOAD_INTERVAL', 0.05):
+            self.task = asyncio.ensure_future(self.forwarder.run_profiles(
+                [MainBot.ForwardingProfile.from_config('a', store.load()['a'])]))
+            await self.wait_for(lambda: self.reader.handlers)
+            store.save('c', {'source_chat_ids': [-2], 'destination_channel_ids': [-30]})
+            await self.wait_for(lambda: 'c' in self.forwarder.profiles)
+            self.forwarder.running = False
+            await self.task
+            self.assertEqual(self.forwarder.profiles, {})
+
+            # A second run with another configuration forwards only its own source.
+            self.task = asyncio.ensure_future(self.forwarder.forward_messages_to_channels(
+                [-5], [-50], [], '', profile_name='x', interactive=False))
+            await self.wait_for(lambda: self.reader.handlers)
+            await asyncio.sleep(0.2)
+            self.assertEqual(sorted(self.forwarder.routes), [-5])
+            self.reader.post(-1, 'hello from a')
+            self.reader.post(-2, 'hello from c')
+            self.reader.post(-5, 'hello from x')
+            await self.wait_for(lambda: self.sent())
+            await asyncio.sleep(0.1)
+        self.assertEqual(self.sender.sent[0][1:], (-50, 'hello from x'))
+        self.assertEqual(len(self.sender.sent), 1)
+
+class MediaCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = MainBot.MediaCache(directory.name, max_bytes=250)
+        client = FakeTelegramClient()
+        self.relay = MainBot.MediaRelay(client, client, 'memory', self.cache)
+        self.downloads = []
+        download = self.relay.download
+
+        async def counting_download(message, file):
+            self.downloads.append(message.id)
+            return await download(message, file)
+        self.relay.download = counting_download
+
+    async def upload(self, message_id, photo_id):
+        # Forget the upload handles, so every call goes through the cache.
+        self.relay.recent_uploads.clear()
+        return await self.relay.upload(FakeMessage(SOURCE, message_id, '', bytes(100), photo_id=photo_id))
+
+    async def test_cached_file_is_downloaded_once(self):
+        first = await self.upload(1, 'p1')
+        second = await self.upload(2, 'p1')
+        self.assertEqual(self.downloads, [1])
+        self.assertEqual(first, second)
+
+    async def test_deleted_file_is_downloaded_again(self):
+        await self.upload(1, 'p1')
+        os.remove(self.cache.path('p1'))
+        self.assertEqual(await self.upload(2, 'p1'), bytes(100))
+        self.assertEqual(self.downloads, [1, 2])
+        self.assertEqual(self.cache.total_bytes, 100)
+
+    async def test_least_recently_used_file_is_evicted(self):
+        await self.upload(1, 'p1')
+        await self.upload(2, 'p2')
+        await self.upload(3, 'p1')
+        await self.upload(4, 'p3')
+        self.assertEqual(list(self.cache.entries), ['p1', 'p3'])
+        self.assertFalse(os.path.exists(self.cache.path('p2')))
+        self.assertEqual(self.cache.total_bytes, 200)
+
+class ShardTest(unittest.TestCase):
+    def test_workers_get_separate_media_caches(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with mock.patch.object(MainBot, 'MEDIA_CACHE_DIR', directory.name):
+            caches = [MainBot.TelegramForwarder(None, None, checkpoint_store=MainBot.CheckpointStore(':memory:'),
+                                                dedup_cache=MainBot.DedupCache(':memory:'),
+                                                shard=(index, 2)).media_relay.cache for index in range(2)]
+        self.assertEqual([cache.directory for cache in caches],
+                         [os.path.join(directory.name, 'worker-0'), os.path.join(directory.name, 'worker-1')])
+        self.assertEqual(caches[0].max_bytes, MainBot.MEDIA_CACHE_MAX_BYTES // 2)
+
+class DaemonTest(unittest.IsolatedAsyncioTestCase):
+    async def test_unreadable_source_is_a_configuration_error(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = MainBot.ProfileStore(os.path.join(directory.name, 'telegramconfiguration.json'))
+        store.save('p', {'source_chat_ids': [SOURCE, -99], 'destination_channel_ids': [DESTINATION]})
+        get_messages = FakeTelegramClient.get_messages
+
+        async def missing_chat(client, entity, **kwargs):
+            if entity == -99:
+                raise ValueError(f"Could not find the input entity for {entity}")
+            return await get_messages(client, entity, **kwargs)
+        with mock.patch.object(MainBot, 'profile_store', store), \
+                mock.patch.object(MainBot, 'FAKE_STATE_FILE', os.path.join(directory.name, 'state.db')), \
+                mock.patch.object(FakeTelegramClient, 'get_messages', missing_chat):
+            code = await MainBot.run_daemon(MainBot.parse_args(['--daemon', '--backend', 'fake', '--profile', 'p']))
+        self.assertEqual(code, MainBot.EXIT_CONFIG_ERROR)
+
+class DialogCacheTest(unittest.TestCase):
+    def test_search_matches_anywhere_in_the_title(self):
+        dialogs = MainBot.DialogCache(':memory:')
+        self.addCleanup(dialogs.close)
+        dialogs.store([(-1, 'Crypto News', 'channel', 10), (-2, 'Daily NEWS digest', 'group', 20),
+                       (-3, '100% Deals', 'channel', 30), (-4, 'Friends', 'group', 40)])
+        self.assertEqual([row[0] for row in dialogs.search('news')], [-1, -2])
+        self.assertEqual([row[0] for row in dialogs.search('0%')], [-3])
+        self.assertEqual(dialogs.search('_'), [])
+
+# Stand-in worker: signals readiness, then drains (ignores) the first SIGTERM and exits on the second.
+DRAINING_WORKER = """
+import signal, sys, time
+signals = []
+def stop(*_):
+    signals.append(True)
+    if len(signals) > 1:
+        sys.exit(1)
+signal.signal(signal.SIGTERM, stop)
+open(sys.argv[1], 'w').close()
+while not signals:
+    time.sleep(0.01)
+sys.exit(0) if sys.argv[2] == 'graceful' else time.sleep(60)
+"""
+
+class ShardSupervisorTest(unittest.IsolatedAsyncioTestCase):
+    def supervisor(self, workers, script, *script_args):
+        supervisor = MainBot.ShardSupervisor([], workers, ':memory:')
+        supervisor.command = lambda index: [sys.executable, '-c', script, *(arg.format(index=index) for arg in script_args)]
+        self.addCleanup(supervisor.registry.close)
+        return supervisor
+
+    async def run_supervisor(self, supervisor):
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(supervisor.run())
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(loop.remove_signal_handler, sig)
+        return task
+
+    def test_crashed_worker_is_restarted_with_a_growing_delay(self):
+        supervisor = self.supervisor(1, 'import sys; sys.exit(3)')
+        with mock.patch.object(MainBot, 'WORKER_RESTART_DELAY', 0.1):
+            supervisor.start(0)
+            first = supervisor.processes[0]
+            first.wait()
+            self.assertIsNone(supervisor.check())
+            self.assertNotIn(0, supervisor.processes)
+            supervisor.check()
+            self.assertNotIn(0, supervisor.processes)
+            time.sleep(0.1)
+            supervisor.check()
+            self.assertIsNot(supervisor.processes[0], first)
+            supervisor.processes[0].wait()
+            supervisor.check()
+        self.assertEqual(supervisor.restarts[0], 2)
+        self.assertGreater(supervisor.next_start[0] - time.monotonic(), 0.1)
+
+    async def test_configuration_error_stops_every_worker(self):
+        supervisor = self.supervisor(1, 'import sys; sys.exit(78)')
+        task = await self.run_supervisor(supervisor)
+        self.assertEqual(await asyncio.wait_for(task, 5), MainBot.EXIT_CONFIG_ERROR)
+
+    async def test_stop_lets_workers_drain(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        ready = os.path.join(directory.name, 'ready-{index}')
+        supervisor = self.supervisor(2, DRAINING_WORKER, ready, 'graceful')
+        task = await self.run_supervisor(supervisor)
+        while not all(os.path.exists(ready.format(index=index)) for index in range(2)):
+            await asyncio.sleep(0.01)
+        supervisor.running = False
+        self.assertEqual(await asyncio.wait_for(task, 5), 0)
+        self.assertEqual([process.returncode for process in supervisor.processes.values()], [0, 0])
+
+    async def test_second_signal_stops_draining_workers(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        ready = os.path.join(directory.name, 'ready-{index}')
+        supervisor = self.supervisor(2, DRAINING_WORKER, ready, 'stuck')
+        task = await self.run_supervisor(supervisor)
+        while not all(os.path.exists(ready.format(index=index)) for index in range(2)):
+            await asyncio.sleep(0.01)
+        supervisor.running = False
+        await asyncio.sleep(0.5)
+        self.assertFalse(task.done())
+        supervisor.force_stop.set()
+        # Well before WORKER_STOP_TIMEOUT, when they would be killed.
+        self.assertEqual(await asyncio.wait_for(task, 5), 1)
+        self.assertEqual([process.returncode for process in supervisor.processes.values()], [1, 1])
+
+class CredentialsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.credentials_file = os.path.join(directory.name, 'credentials')
+        for patch in (mock.patch.object(MainBot, 'CREDENTIALS_FILE', self.credentials_file),
+                      mock.patch.object(MainBot, 'KEY_FILE', os.path.join(directory.name, 'key')),
+                      mock.patch('builtins.print')):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def read(self, remember='y'):
+        derive = mock.Mock(wraps=MainBot.get_key)
+        with mock.patch.object(MainBot, 'get_key', derive), \
+                mock.patch('getpass.getpass', return_value='secret'), \
+                mock.patch('builtins.input', return_value=remember):
+            return MainBot.read_credentials(), derive.call_count
+
+    def test_legacy_file_gets_a_random_salt(self):
+        from cryptography.fernet import Fernet
+        credentials = {'api_id': '1', 'api_hash': 'hash', 'bot_token': 'token'}
+        legacy = Fernet(MainBot.get_key('secret')).encrypt(json.dumps(credentials).encode())
+        with open(self.credentials_file, 'wb') as f:
+            f.write(legacy)
+        # One derivation to decrypt, one for the new salt, reused for the remembered key.
+        self.assertEqual(self.read(), (('1', 'hash', 'token'), 2))
+        with open(self.credentials_file, 'rb') as f:
+            self.assertNotEqual(MainBot.parse_credentials(f.read())[0], MainBot.LEGACY_SALT)
+        self.assertEqual(self.read(), (('1', 'hash', 'token'), 0))
+
+    def test_upgraded_file_is_unlocked_with_one_derivation(self):
+        with open(self.credentials_file, 'wb') as f:
+            f.write(MainBot.encrypt_data({'api_id': '1', 'api_hash': 'hash', 'bot_token': 'token'}, 'secret'))
+        self.assertEqual(self.read(remember='n'), (('1', 'hash', 'token'), 1))
+
+if __name__ == "__main__":
+    unittest.main()